@@ -3,26 +3,96 @@
 # ----------------------------------------------------------------------------#
 
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, flash, redirect, url_for
+from flask import Flask, Blueprint, render_template, request, flash, redirect, url_for, abort, session, jsonify, g, \
+    Response, stream_with_context, current_app, make_response, send_from_directory, send_file
+from werkzeug.local import LocalProxy
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from sqlalchemy import func
+from sqlalchemy import func, and_, case, bindparam, text, event, DDL, Table, MetaData, Computed, exc, any_, \
+    literal
+from sqlalchemy.dialects.postgresql import TSVECTOR, TSRANGE, ARRAY
+from psycopg2 import errorcodes
+from itertools import groupby
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
 import logging
 from logging import Formatter, FileHandler
 from forms import *
+from pagination import keyset_paginate
+from search import search
+from availability import free_evenings
+from facets import has_genre, genre_pairs, genre_facets
+from matchmaking import encode, top_matches, outscored
+from queryplan import explain_routes
+from pagecache import PageCache
+from conditional import make_validators, is_not_modified, add_validators, not_modified
+from dateformat import format_datetime, format_datetimes
+import assets
+from imageproxy import DiskLRUCache, OriginError, fetch, resize
+from replicas import RoutingSQLAlchemy, read_only, recently_wrote, read_from_replica
+from pooling import protect_pool_across_forks, apply_statement_timeouts, engine_options, TimedQueuePool
+from instrumentation import RequestInstrumentation
+from querybudget import QueryBudgetGuard, max_queries
+from seed import generate_venues, generate_artists, generate_shows
+from importer import RowError, read_records, batches, clean_venue, clean_artist, clean_show, \
+    resolve_names, existing_ids, copy_rows, booking, booked_indexes
+import os
+import re
 import sys
+import mimetypes
+import hashlib
+import json
+import random
+import click
+from functools import wraps
+import config
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+moment = Moment()
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+instrumentation = RequestInstrumentation()
+query_budget_guard = QueryBudgetGuard()
+main = Blueprint('main', __name__, cli_group=None)
+
+
+def create_app(profile=None):
+    """Build the app with the config profile ``profile``, by default the one named by FYYUR_ENV."""
+    app = Flask(__name__)
+    app.config.from_object(config.get_profile(profile))
+    if not app.config['SECRET_KEY']:
+        raise RuntimeError('Set SECRET_KEY: every worker has to sign sessions with the same key.')
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    moment.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+    instrumentation.init_app(app)
+    query_budget_guard.init_app(app)
+    protect_pool_across_forks()
+    apply_statement_timeouts()
+    app.extensions['asset_manifest'] = assets.load_manifest(app.static_folder) if app.config['ASSET_BUNDLES'] else None
+    app.extensions['image_cache'] = DiskLRUCache(app.config['IMAGE_CACHE_DIR'], app.config['IMAGE_CACHE_MAX_BYTES'])
+    app.extensions['page_cache'] = PageCache(maxsize=app.config['PAGE_CACHE_SIZE'],
+                                             ttl=app.config['PAGE_CACHE_TTL'])
+    app.register_blueprint(main)
+
+    if not app.debug and not app.testing:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
+
 
 # ----------------------------------------------------------------------------#
 # Models.
@@ -30,12 +100,16 @@ migrate = Migrate(app, db)
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_state_city_id', 'state', 'city', 'id'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     genres = db.Column(db.ARRAY(db.String()))
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     website = db.Column(db.String(120))
@@ -44,6 +118,11 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref='Venue', lazy=True)
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(),
+                           onupdate=func.now())
 
     def __repr__(self):
         return f'Venue {self.name}'
@@ -51,9 +130,13 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -64,43 +147,818 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref='Artist', lazy=True)
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(),
+                           onupdate=func.now())
 
     def __repr__(self):
         return f'Artist {self.name}'
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # one partition per month, see `flask partition-shows`
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
+    # part of the key because Postgres requires it of a partitioned table
+    start_time = db.Column(db.DateTime, primary_key=True, nullable=False)
+    # the time the show books its venue for: four hours, cut off at midnight. An exclusion
+    # constraint on every partition keeps the bookings of a venue from overlapping
+    during = db.deferred(db.Column(TSRANGE, Computed(
+        "tsrange(start_time, least(start_time + interval '4 hours', date_trunc('day', start_time) + interval '1 day'))",
+        persisted=True)))
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.now(),
+                           onupdate=func.now())
 
     def __repr__(self):
         return f'Show artist_id: {self.artist_id} venue_id: {self.venue_id}'
 
 
+# databases made by create_all rather than the migrations keep all their shows in here.
+# Only the migrations add the exclusion constraint against double bookings, to each
+# partition: in such databases /shows/create accepts them, and only the bulk import
+# checks for them itself
+event.listen(Show.__table__, 'after_create', DDL('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT'))
+
+
+class ShowCounterWatermark(db.Model):
+    """Point in time that the upcoming/past show counters are relative to.
+
+    A show counts as upcoming while its start_time is after ``rolled_at``;
+    ``flask roll-show-counters`` moves the watermark forward.
+    """
+    __tablename__ = 'ShowCounterWatermark'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'ShowCounterWatermark {self.rolled_at}'
+
+
+class TableVersion(db.Model):
+    """When a table last changed, kept current by statement-level triggers.
+
+    The listing pages use it as their validator for conditional GETs.
+    ``first_changed_at`` is the first change since the views built from the
+    table last caught up, None while they are current; only the VenueListing
+    refresh clears it, for Venue.
+    """
+    __tablename__ = 'TableVersion'
+
+    table_name = db.Column(db.String(63), primary_key=True)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    first_changed_at = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f'TableVersion {self.table_name} {self.changed_at}'
+
+
+class GenreCount(db.Model):
+    """How many venues or artists (``kind``) of a state list a genre, kept current by statement-level triggers.
+
+    The genre pages read their facet counts from it.
+    """
+    __tablename__ = 'GenreCount'
+
+    kind = db.Column(db.String(63), primary_key=True)
+    genre = db.Column(db.String, primary_key=True)
+    # '' for the rows without a state
+    state = db.Column(db.String(120), primary_key=True)
+    total = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'GenreCount {self.kind} {self.genre} {self.state} {self.total}'
+
+
+class SuggestionQueue(db.Model):
+    """Venues and artists whose profile changed since ``flask update-suggestions`` last ran."""
+    __tablename__ = 'SuggestionQueue'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    kind = db.Column(db.String(63), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'SuggestionQueue {self.kind} {self.entity_id}'
+
+
+class SuggestedArtist(db.Model):
+    """An artist seeking a venue suggested to a venue seeking talent, precomputed by ``flask update-suggestions``.
+
+    No foreign keys: the next run drops the suggestions of and to a deleted
+    venue or artist, and the pages only list the ones that still exist.
+    """
+    __tablename__ = 'SuggestedArtist'
+    __table_args__ = (
+        db.Index('ix_SuggestedArtist_artist_id', 'artist_id'),
+    )
+
+    venue_id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'SuggestedArtist venue_id: {self.venue_id} artist_id: {self.artist_id} score: {self.score}'
+
+
+class SuggestedVenue(db.Model):
+    """A venue seeking talent suggested to an artist seeking a venue, the reverse of SuggestedArtist."""
+    __tablename__ = 'SuggestedVenue'
+    __table_args__ = (
+        db.Index('ix_SuggestedVenue_venue_id', 'venue_id'),
+    )
+
+    artist_id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'SuggestedVenue artist_id: {self.artist_id} venue_id: {self.venue_id} score: {self.score}'
+
+
+class VenueListing(db.Model):
+    """The columns of /venues, a materialized view of Venue refreshed by ``flask refresh-venue-listing``.
+
+    Its TableVersion row is the latest change to Venue that it reflects. The
+    view comes from a migration, so its table is kept out of ``db.metadata``
+    where create_all would make a plain table of it.
+    """
+    __table__ = Table(
+        'VenueListing', MetaData(),
+        db.Column('id', db.Integer, primary_key=True),
+        db.Column('name', db.String),
+        db.Column('city', db.String(120)),
+        db.Column('state', db.String(120)),
+        db.Column('upcoming_shows_count', db.Integer),
+    )
+
+    def __repr__(self):
+        return f'VenueListing {self.name}'
+
+
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+main.add_app_template_filter(format_datetime, 'datetime')
+
+
+@main.app_template_global()
+def asset_urls(name):
+    """URLs that load the bundle or static file ``name``: its fingerprinted build if any, else its sources."""
+    manifest = current_app.extensions['asset_manifest']
+    if manifest and name in manifest:
+        return [url_for('static', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in assets.BUNDLES.get(name, [name])]
+
+
+@main.app_template_global()
+def asset_url(name):
+    return asset_urls(name)[0]
+
+
+def image_version(link):
+    return hashlib.sha1(link.encode()).hexdigest()[:12]
+
+
+@main.app_template_global()
+def image_url(kind, entity_id, link, size):
+    """URL of ``link`` resized to ``size`` by the image proxy; the version changes with the link."""
+    if not link or not current_app.config['IMAGE_PROXY']:
+        return link
+    return url_for('main.image', kind=kind, entity_id=entity_id, size=size, v=image_version(link))
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+def paginate(query, columns, key):
+    per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+    try:
+        return keyset_paginate(query, columns, key,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               per_page=per_page)
+    except ValueError:
+        abort(400)
+
+
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+image_cache = LocalProxy(lambda: current_app.extensions['image_cache'])
+
+
+def page_validators(validator, *args):
+    """(etag, last_modified) from ``validator``, or None when conditional GETs are off or it has none."""
+    if not current_app.config['CONDITIONAL_GET']:
+        return None
+    return validator(*args)
+
+
+def conditional_response(page, validators):
+    if validators is None:
+        return page
+    if is_not_modified(request, *validators):
+        return not_modified(*validators)
+    return add_validators(make_response(page), *validators)
+
+
+def conditional(validator):
+    """Answer If-None-Match/If-Modified-Since with a 304 before the decorated view renders anything.
+
+    ``validator()`` returns the page's (etag, last_modified) from one cheap
+    query, or None when the page cannot be validated.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # a page rendered with pending flash messages belongs to one user
+            if '_flashes' in session:
+                return view(**kwargs)
+            validators = page_validators(validator)
+            if validators is not None and is_not_modified(request, *validators):
+                return not_modified(*validators)
+            return conditional_response(view(**kwargs), validators)
+        return wrapper
+    return decorator
+
+
+def cached_page(kind, validator):
+    """Serve the decorated detail view from ``page_cache``, keyed by (kind, entity id).
+
+    ``validator(entity_id)`` returns the page's (etag, last_modified) from one
+    cheap query. A cached page keeps the validators it was rendered with and
+    is only served while they are still current: every worker has a cache of
+    its own, and a write through one of them has to retire the copies of all
+    the others. Conditional GETs are answered as with ``conditional``. Pages
+    read from a replica are not cached, and clients that just wrote skip the
+    cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if '_flashes' in session:
+                return view(**kwargs)
+            key = (kind, kwargs[f'{kind}_id'])
+            current = validator(key[1])
+            # the view answers for an entity that does not exist
+            if current is None:
+                return view(**kwargs)
+            validators = current if current_app.config['CONDITIONAL_GET'] else None
+            if validators is not None and is_not_modified(request, *validators):
+                return not_modified(*validators)
+            # a client that just wrote reads from the primary, and the cached page may predate its write
+            entry = None if recently_wrote() else page_cache.get(key)
+            if entry is None or entry[1] != current:
+                entry = (view(**kwargs), current)
+                # a replica may not have replayed the write that changed the page yet
+                if not read_from_replica():
+                    page_cache.set(key, entry)
+            return conditional_response(entry[0], validators)
+        return wrapper
+    return decorator
+
+
+def table_versions(*names):
+    """{table name: changed_at, or None without a TableVersion row}, read at most once per request.
+
+    The first_changed_at of the rows read is kept in ``g.first_changes``.
+    """
+    versions = g.setdefault('table_versions', {})
+    first_changes = g.setdefault('first_changes', {})
+    missing = [name for name in names if name not in versions]
+    if missing:
+        versions.update(dict.fromkeys(missing))
+        for name, changed_at, first_changed_at in db.session.query(
+                TableVersion.table_name, TableVersion.changed_at, TableVersion.first_changed_at) \
+                .filter(TableVersion.table_name.in_(missing)):
+            versions[name] = changed_at
+            first_changes[name] = first_changed_at
+    return {name: versions[name] for name in names}
+
+
+def listing_validators(*models):
+    """Validators for a page of a listing built from the tables of ``models``."""
+    versions = table_versions(*sorted(model.__table__.name for model in models))
+    # tables created by db.create_all have no version triggers
+    if None in versions.values():
+        return None
+    return make_validators(current_app.config['RELEASE'], request.full_path, *versions.values())
+
+
+def venue_listing_source():
+    """VenueListing until the first venue change it misses is VENUE_LISTING_MAX_STALENESS seconds old, then Venue."""
+    versions = table_versions('Venue', 'VenueListing')
+    reflected = versions['VenueListing']
+    # databases made by create_all have neither the view nor the versions
+    if reflected is None or versions['Venue'] is None:
+        return Venue
+    if versions['Venue'] <= reflected:
+        return VenueListing
+    # a refresh long ago says nothing about how long the view has been missing changes
+    staleness = datetime.now(timezone.utc) - (g.first_changes['Venue'] or reflected)
+    if staleness <= timedelta(seconds=current_app.config['VENUE_LISTING_MAX_STALENESS']):
+        return VenueListing
+    return Venue
+
+
+def genre_counts(model):
+    """The (genre, state, total) rows of ``model``: GenreCount, or counted from ``model`` itself."""
+    # databases made by create_all have neither the count triggers nor the versions
+    if table_versions(model.__tablename__)[model.__tablename__] is None:
+        return genre_pairs(db.session, model)
+    return db.session.query(GenreCount.genre, GenreCount.state, GenreCount.total) \
+        .filter(GenreCount.kind == model.__tablename__).subquery()
+
+
+def detail_validators(model, owner_column, partner, partner_column, entity_id):
+    """Validators for the page of one venue or artist, which also shows its shows and their partners.
+
+    The page changes when the entity, one of its shows or a partner changes,
+    when a show is deleted, and when the latest show moves into the past.
+    """
+    now = datetime.now()
+    row = db.session.query(model.updated_at,
+                           func.max(func.greatest(Show.updated_at, partner.updated_at)),
+                           func.count(Show.id),
+                           func.max(case([(Show.start_time <= now, Show.start_time)]))) \
+        .outerjoin(Show, owner_column == model.id).outerjoin(partner, partner.id == partner_column) \
+        .filter(model.id == entity_id).group_by(model.id).first()
+    if row is None:
+        return None
+    return make_validators(current_app.config['RELEASE'], model.__tablename__, entity_id, *row)
+
+
+def venue_validators(venue_id):
+    return detail_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_validators(artist_id):
+    return detail_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+def evict_pages(venue_ids=(), artist_ids=()):
+    # only frees this worker's copies; the others drop theirs when they find them outdated
+    page_cache.invalidate(*[('venue', int(venue_id)) for venue_id in venue_ids],
+                          *[('artist', int(artist_id)) for artist_id in artist_ids])
+
+
+def stream_rows(query, id_column):
+    """Stream the column tuples of ``query`` as NDJSON, or as a JSON array with ?format=json.
+
+    Rows are read through a server-side cursor in batches of STREAM_BATCH_SIZE
+    and never hydrated into ORM objects. ?after_id=N resumes a previous pull.
+    """
+    keys = [column['name'] for column in query.column_descriptions]
+    after_id = request.args.get('after_id', type=int)
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    rows = query.order_by(id_column).yield_per(current_app.config['STREAM_BATCH_SIZE'])
+
+    def encode(row):
+        return json.dumps(dict(zip(keys, row)), default=lambda value: value.isoformat())
+
+    if request.args.get('format') == 'json':
+        def generate():
+            yield '['
+            for index, row in enumerate(rows):
+                yield (',' if index else '') + encode(row)
+            yield ']'
+        mimetype = 'application/json'
+    else:
+        def generate():
+            for row in rows:
+                yield encode(row) + '\n'
+        mimetype = 'application/x-ndjson'
+
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def show_partner_ids(partner_column, *criterion):
+    # venue pages list artist names and images and vice versa
+    return [row[0] for row in db.session.query(partner_column).filter(*criterion).distinct()]
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+SHOW_COUNTER_OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def get_show_counter_watermark(for_update=False):
+    # writers share the lock so that a roll-forward waits for them to finish
+    query = db.session.query(ShowCounterWatermark).filter_by(id=1)
+    query = query.with_for_update() if for_update else query.with_for_update(read=True)
+    watermark = query.first()
+    if watermark is None:
+        watermark = ShowCounterWatermark(id=1, rolled_at=datetime.now())
+        db.session.add(watermark)
+        db.session.flush()
+    return watermark
+
+
+def count_shows(owner_column, watermark, *criterion):
+    return db.session.query(owner_column.label('owner_id'),
+                            func.count(case([(Show.start_time > watermark, 1)])).label('upcoming'),
+                            func.count(case([(Show.start_time <= watermark, 1)])).label('past')) \
+        .filter(*criterion).group_by(owner_column)
+
+
+def update_show_counters(model, deltas):
+    """Add (upcoming, past) deltas to the counters of ``model`` rows, keyed by id."""
+    if not deltas:
+        return
+    table = model.__table__
+    statement = table.update().where(table.c.id == bindparam('owner_id')).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+        past_shows_count=table.c.past_shows_count + bindparam('past'))
+    db.session.execute(statement, [{'owner_id': owner_id, 'upcoming': upcoming, 'past': past}
+                                   for owner_id, (upcoming, past) in deltas.items()])
+
+
+def add_shows_to_counters(shows, sign=1):
+    """Count new shows, given as (venue_id, artist_id, start_time), on their venue and artist.
+
+    With ``sign=-1``, take deleted shows off instead. Callers write Show
+    first: every transaction then locks the TableVersion rows in the order
+    Show, Venue, Artist, and two of them cannot deadlock on those rows.
+    """
+    watermark = get_show_counter_watermark().rolled_at
+    venue_deltas = {}
+    artist_deltas = {}
+    for venue_id, artist_id, start_time in shows:
+        is_upcoming = start_time > watermark
+        for deltas, owner_id in ((venue_deltas, venue_id), (artist_deltas, artist_id)):
+            upcoming, past = deltas.get(owner_id, (0, 0))
+            deltas[owner_id] = (upcoming + sign, past) if is_upcoming else (upcoming, past + sign)
+    update_show_counters(Venue, venue_deltas)
+    update_show_counters(Artist, artist_deltas)
+
+
+def add_show_to_counters(show):
+    add_shows_to_counters([(show.venue_id, show.artist_id, show.start_time)])
+
+
+def delete_shows(*criterion):
+    """Delete the shows matching ``criterion`` and take them off the counters."""
+    # the counters go by the rows actually deleted, not by a count that a new show could slip past
+    deleted = db.session.execute(Show.__table__.delete().where(and_(*criterion))
+                                 .returning(Show.venue_id, Show.artist_id, Show.start_time)).fetchall()
+    add_shows_to_counters(deleted, sign=-1)
+
+
+def roll_show_counters(now=None):
+    """Move shows that started since the last roll from upcoming to past."""
+    now = now or datetime.now()
+    watermark = get_show_counter_watermark(for_update=True)
+    if now <= watermark.rolled_at:
+        return 0
+    started = and_(Show.start_time > watermark.rolled_at, Show.start_time <= now)
+    moved = 0
+    for model, owner_column in SHOW_COUNTER_OWNERS:
+        rows = db.session.query(owner_column, func.count(Show.id)).filter(started).group_by(owner_column).all()
+        update_show_counters(model, {owner_id: (-count, count) for owner_id, count in rows})
+        if model is Venue:
+            moved = sum(count for _, count in rows)
+    watermark.rolled_at = now
+    return moved
+
+
+def reconcile_show_counters(fix=True):
+    """Recompute every counter from the Show table and return the rows that drifted."""
+    watermark = get_show_counter_watermark(for_update=True).rolled_at
+    drift = []
+    for model, owner_column in SHOW_COUNTER_OWNERS:
+        actual = count_shows(owner_column, watermark).subquery()
+        upcoming = func.coalesce(actual.c.upcoming, 0)
+        past = func.coalesce(actual.c.past, 0)
+        rows = db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past) \
+            .outerjoin(actual, actual.c.owner_id == model.id) \
+            .filter((model.upcoming_shows_count != upcoming) | (model.past_shows_count != past)).all()
+        drift.extend((model.__name__,) + tuple(row) for row in rows)
+        if fix:
+            update_show_counters(model, {row[0]: (row[3] - row[1], row[4] - row[2]) for row in rows})
+    return drift
+
+
+# ----------------------------------------------------------------------------#
+# Show partitions.
+# ----------------------------------------------------------------------------#
+
+SHOW_PARTITION_NAME = re.compile(r'^Show_(\d{4})_(\d{2})$')
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_show_partitions(months_ahead, today=None):
+    """Create the missing monthly Show partitions up to ``months_ahead`` months ahead; return their names."""
+    this_month = (today or date.today()).replace(day=1)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(this_month, offset)
+        if db.session.execute(text('SELECT fyyur_ensure_show_partition(:month)'), {'month': month}).scalar():
+            created.append(f'Show_{month:%Y_%m}')
+    return created
+
+
+def archive_show_partitions(before):
+    """Move the monthly Show partitions that ended by ``before`` into the archive schema; return their names.
+
+    The archived shows leave every page and the counters are recomputed
+    without them. Their foreign keys are dropped, so deleting a venue or an
+    artist is not held up by its archived shows.
+    """
+    partitions = db.session.execute(text(
+        'SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = \'"Show"\'::regclass')).fetchall()
+    archived = []
+    for name, in sorted(partitions):
+        match = SHOW_PARTITION_NAME.match(name)
+        if match is None or add_months(date(int(match[1]), int(match[2]), 1), 1) > before:
+            continue
+        db.session.execute(text('CREATE SCHEMA IF NOT EXISTS archive'))
+        db.session.execute(text(f'ALTER TABLE "Show" DETACH PARTITION "{name}"'))
+        foreign_keys = db.session.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"),
+            {'table': f'"{name}"'}).fetchall()
+        for constraint, in foreign_keys:
+            db.session.execute(text(f'ALTER TABLE "{name}" DROP CONSTRAINT "{constraint}"'))
+        db.session.execute(text(f'ALTER TABLE "{name}" SET SCHEMA archive'))
+        archived.append(name)
+    if archived:
+        # DETACH fires no triggers
+        db.session.execute(text(
+            'UPDATE "TableVersion" SET changed_at = clock_timestamp() WHERE table_name = \'Show\''))
+        reconcile_show_counters()
+    return archived
+
 
+# ----------------------------------------------------------------------------#
+# Venue listing.
+# ----------------------------------------------------------------------------#
 
-app.jinja_env.filters['datetime'] = format_datetime
+def refresh_venue_listing(force=False):
+    """Refresh VenueListing if Venue changed since its last refresh, or if ``force``; return whether it ran.
+
+    The Venue version is read before the refresh and without a lock, so
+    venue writes and bookings carry on meanwhile. The view then reflects
+    every change up to the version it records and maybe a few later ones,
+    which the next refresh sees as changes it still has to pick up.
+    """
+    # keeps two refreshes from running at once
+    listing = db.session.query(TableVersion).filter(TableVersion.table_name == 'VenueListing') \
+        .with_for_update().first()
+    # databases made by create_all have neither the view nor the versions
+    if listing is None:
+        return False
+    changed_at = db.session.query(TableVersion.changed_at).filter(TableVersion.table_name == 'Venue').scalar()
+    if not force and listing.changed_at >= changed_at:
+        return False
+    # /venues keeps reading the old contents until this commits
+    db.session.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY "VenueListing"'))
+    listing.changed_at = changed_at
+    # changes committed after the refresh started are missing from the view;
+    # the start of this transaction is no later than the first of them
+    db.session.query(TableVersion).filter(TableVersion.table_name == 'Venue').update(
+        {TableVersion.first_changed_at: case([(TableVersion.changed_at > changed_at, func.now())])},
+        synchronize_session=False)
+    return True
+
+
+# ----------------------------------------------------------------------------#
+# Suggestions.
+# ----------------------------------------------------------------------------#
+
+# for each side of the matchmaking: the other side, the flag of the profiles
+# looking for it, and the table of their suggestions with its two id columns
+SUGGESTION_SIDES = {
+    Venue: (Artist, Venue.seeking_talent, SuggestedArtist, SuggestedArtist.venue_id, SuggestedArtist.artist_id),
+    Artist: (Venue, Artist.seeking_venue, SuggestedVenue, SuggestedVenue.artist_id, SuggestedVenue.venue_id),
+}
+SUGGESTION_KINDS = {model.__tablename__: model for model in SUGGESTION_SIDES}
+
+
+def id_in(column, ids):
+    # one array parameter however many ids
+    return column == any_(literal(sorted(ids), ARRAY(db.Integer)))
+
+
+def queue_suggestions(model, entity_id):
+    """Have the next ``flask update-suggestions`` take the changed profile of a venue or artist into account."""
+    db.session.add(SuggestionQueue(kind=model.__tablename__, entity_id=entity_id))
+
+
+def seeking_profiles(model):
+    """The profiles of the venues or artists that are looking for the other side."""
+    seeking = SUGGESTION_SIDES[model][1]
+    rows = db.session.query(model.id, model.genres, model.city, model.state).filter(seeking.is_(True)).all()
+    return encode(rows, [genre for genre, _ in VenueForm.genres.kwargs['choices']])
+
+
+def suggestion_floors(model):
+    """{owner id: lowest score} of the full suggestion lists of ``model``."""
+    _, _, suggestion, owner_column, _ = SUGGESTION_SIDES[model]
+    return dict(db.session.query(owner_column, func.min(suggestion.score)).group_by(owner_column)
+                .having(func.count() >= current_app.config['SUGGESTION_COUNT']))
+
+
+def replace_suggestions(model, owner_ids, owners, partners):
+    """Replace the suggestion lists of ``owner_ids``, or all of them, with the best ``partners`` of ``owners``."""
+    _, _, suggestion, owner_column, partner_column = SUGGESTION_SIDES[model]
+    query = db.session.query(suggestion)
+    if owner_ids is not None:
+        query = query.filter(id_in(owner_column, owner_ids))
+    query.delete(synchronize_session=False)
+
+    config = current_app.config
+    columns = [owner_column.key, partner_column.key, 'score']
+    matches = top_matches(owners, partners, config['SUGGESTION_COUNT'], config['SUGGESTION_WEIGHTS'],
+                          config['SUGGESTION_BATCH_CELLS'])
+    rows = (dict(zip(columns, (owner_id, partner_id, score)))
+            for owner_id, partner_scores in matches for partner_id, score in partner_scores)
+    connection = db.session.connection()
+    for batch in batches(rows, 10000):
+        copy_rows(connection, suggestion.__table__, columns, batch)
+
+
+def update_suggestions(full=False):
+    """Recompute the suggestion lists the profile changes in SuggestionQueue may have changed, or all of them.
+
+    Besides the lists of the changed venues and artists, that means the
+    lists on the other side that hold a changed profile, whose score may
+    have dropped, and those whose weakest suggestion a changed profile now
+    outscores. Returns {table name: lists recomputed}.
+    """
+    # runs one at a time; /venues/<id>/suggested-artists and the like keep reading the old lists until the commit
+    db.session.execute(text('LOCK TABLE "SuggestedArtist", "SuggestedVenue" IN EXCLUSIVE MODE'))
+    # only what is read here leaves the queue: a change committed meanwhile waits for the next run
+    queued = db.session.query(SuggestionQueue.id, SuggestionQueue.kind, SuggestionQueue.entity_id).all()
+    changed = {model: set() for model in SUGGESTION_SIDES}
+    for _, kind, entity_id in queued:
+        changed[SUGGESTION_KINDS[kind]].add(entity_id)
+    profiles = {model: seeking_profiles(model) for model in SUGGESTION_SIDES}
+    config = current_app.config
+
+    recomputed = {}
+    for model, (partner, _, _, owner_column, partner_column) in SUGGESTION_SIDES.items():
+        owners, owner_ids = profiles[model], None
+        if not full:
+            owner_ids = set(changed[model])
+            if changed[partner]:
+                owner_ids.update(owner_id for owner_id, in db.session.query(owner_column)
+                                 .filter(id_in(partner_column, changed[partner])).distinct())
+                owner_ids |= outscored(owners, suggestion_floors(model), profiles[partner].take(changed[partner]),
+                                       config['SUGGESTION_WEIGHTS'], config['SUGGESTION_BATCH_CELLS'])
+            owners = owners.take(owner_ids)
+        if owner_ids is None or owner_ids:
+            replace_suggestions(model, owner_ids, owners, profiles[partner])
+        recomputed[model.__tablename__] = len(owners) if full else len(owner_ids)
+
+    if queued:
+        db.session.query(SuggestionQueue).filter(id_in(SuggestionQueue.id, [row.id for row in queued])) \
+            .delete(synchronize_session=False)
+    return recomputed
+
+
+# ----------------------------------------------------------------------------#
+# Bulk import.
+# ----------------------------------------------------------------------------#
+
+IMPORTERS = {
+    'venues': (Venue, clean_venue),
+    'artists': (Artist, clean_artist),
+    'shows': (Show, clean_show),
+}
+
+
+def resolve_show_owners(rows, errors):
+    """Replace venue/artist names in show rows by ids and drop rows that do not resolve or double book."""
+    connection = db.session.connection()
+    lookups = {}
+    for kind, model in (('venue', Venue), ('artist', Artist)):
+        names = {row[kind] for _, row in rows if kind in row}
+        ids = {row[f'{kind}_id'] for _, row in rows if f'{kind}_id' in row}
+        by_name, ambiguous = resolve_names(connection, model.__table__, names) if names else ({}, set())
+        known_ids = existing_ids(connection, model.__table__, ids) if ids else set()
+        lookups[kind] = (by_name, ambiguous, known_ids)
+
+    resolved = []
+    for line_number, row in rows:
+        try:
+            for kind, (by_name, ambiguous, known_ids) in lookups.items():
+                if kind in row:
+                    name = row.pop(kind)
+                    if name in ambiguous:
+                        raise RowError(f'{kind}: more than one {kind} is named {name!r}, give {kind}_id')
+                    if name not in by_name:
+                        raise RowError(f'{kind}: no {kind} is named {name!r}')
+                    row[f'{kind}_id'] = by_name[name]
+                elif row[f'{kind}_id'] not in known_ids:
+                    raise RowError(f'{kind}_id: no {kind} has id {row[f"{kind}_id"]}')
+        except RowError as error:
+            errors.append((line_number, str(error)))
+        else:
+            resolved.append((line_number, row))
+    return drop_double_bookings(connection, resolved, errors)
+
+
+def drop_double_bookings(connection, rows, errors):
+    """Drop the show rows that overlap a booked show of their venue or an earlier row of ``rows``.
+
+    COPY would otherwise fail the whole batch on the exclusion constraint.
+    """
+    booked = booked_indexes(connection, Show.__table__, [row for _, row in rows])
+    kept = []
+    bookings = defaultdict(list)
+    for index, (line_number, row) in enumerate(rows):
+        start, end = booking(row['start_time'])
+        overlapping = [other for other_start, other_end, other in bookings[row['venue_id']]
+                       if other_start < end and start < other_end]
+        if index in booked:
+            errors.append((line_number, 'start_time: the venue already has a show at that time'))
+        elif overlapping:
+            errors.append((line_number, f'start_time: the venue has a show at that time on line {overlapping[0]}'))
+        else:
+            kept.append((line_number, row))
+            bookings[row['venue_id']].append((start, end, line_number))
+    return kept
+
+
+def import_records(kind, path, batch_size=5000):
+    """Bulk load a CSV/JSON-lines file into the ``kind`` table, one transaction per batch.
+
+    Returns the number of rows loaded and a (line number, error) list of the
+    rows that were rejected.
+    """
+    model, clean = IMPORTERS[kind]
+    loaded = 0
+    errors = []
+
+    for batch in batches(read_records(path), batch_size):
+        rows = []
+        for line_number, record in batch:
+            try:
+                if isinstance(record, RowError):
+                    raise record
+                rows.append((line_number, clean(record)))
+            except RowError as error:
+                errors.append((line_number, str(error)))
+
+        if kind == 'shows':
+            # hold the counter watermark so a roll-forward cannot run mid-batch
+            get_show_counter_watermark()
+            rows = resolve_show_owners(rows, errors)
+        rows = [row for _, row in rows]
+        if rows:
+            copy_rows(db.session.connection(), model.__table__, list(rows[0]), rows)
+            if kind == 'shows':
+                add_shows_to_counters((row['venue_id'], row['artist_id'], row['start_time']) for row in rows)
+        db.session.commit()
+        loaded += len(rows)
+
+    return loaded, errors
+
+
+def seed_database(venues, artists, shows, seed=None, batch_size=10000):
+    """Replace all venues, artists and shows with a synthetic data set, and compute its suggestions and listing."""
+    rng = random.Random(seed)
+    db.session.execute('TRUNCATE "Show", "Venue", "Artist", "SuggestionQueue", "SuggestedArtist", "SuggestedVenue" '
+                       'RESTART IDENTITY')
+    connection = db.session.connection()
+    for model, rows in ((Venue, generate_venues(rng, venues)),
+                        (Artist, generate_artists(rng, artists)),
+                        (Show, generate_shows(rng, shows, venues, artists))):
+        for batch in batches(rows, batch_size):
+            copy_rows(connection, model.__table__, list(batch[0]), batch)
+    reconcile_show_counters()
+    update_suggestions(full=True)
+    # /venues would otherwise serve the view of the old data while it counts as fresh
+    refresh_venue_listing(force=True)
+    db.session.execute('ANALYZE "Venue", "Artist", "Show"')
+    db.session.commit()
+    page_cache.clear()
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('pages/home.html')
 
@@ -108,84 +966,102 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@max_queries(2)
+# the version of the table the page is read from: the same ETag means the same page
+@conditional(lambda: listing_validators(venue_listing_source()))
 def venues():
-    all_locations = db.session.query(func.count(Venue.id), Venue.city, Venue.state) \
-        .group_by(Venue.city, Venue.state).all()
+    # one pass: a page of venues with their show counters, ordered so
+    # that venues of the same area are adjacent and can be grouped in Python
+    source = venue_listing_source()
+    query = db.session.query(source.id, source.name, source.city, source.state,
+                             source.upcoming_shows_count.label('num_upcoming_shows'))
+    page = paginate(query, [source.state, source.city, source.id],
+                    key=lambda row: (row.state, row.city, row.id))
     data = []
 
-    for location in all_locations:
-        city = location[1]
-        state = location[2]
-        location_venues = db.session.query(Venue).filter_by(city=city).filter_by(state=state).all()
-        venues_data = []
-        for venue in location_venues:
-            venues_data.append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(db.session.query(Show).filter(not Show.venue_id)
-                                          .filter(Show.start_time > datetime.now()).all())
-            })
+    for (city, state), location_venues in groupby(page, key=lambda row: (row.city, row.state)):
         data.append({
             "city": city,
             "state": state,
-            "venues": venues_data
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows
+            } for venue in location_venues]
         })
-    return render_template('pages/venues.html', areas=data)
+    return render_template('pages/venues.html', areas=data, page=page)
 
 
-@app.route('/venues/search', methods=['POST'])
+@main.route('/venues/search', methods=['POST'])
+@read_only
+@max_queries(1)
 def search_venues():
     search_term = request.form.get('search_term', '')
-    result = db.session.query(Venue).filter(Venue.name.ilike(f'%{search_term}%')).all()
+    genre = request.form.get('genre', '')
+    result = search(db.session, Venue, search_term, limit=current_app.config['SEARCH_LIMIT'],
+                    columns=[Venue.id, Venue.name, Venue.upcoming_shows_count], genre=genre or None)
     data = []
 
     for venue in result:
         data.append({
             "id": venue.id,
             "name": venue.name,
-            "num_upcoming_shows": len(
-                db.session.query(Show).filter(Show.venue_id == venue.id).filter(Show.start_time > datetime.now()).all())
+            "num_upcoming_shows": venue.upcoming_shows_count
         })
     response = {
         "count": len(result),
         "data": data
     }
     return render_template('pages/search_venues.html', results=response,
-                           search_term=request.form.get('search_term', ''))
-
-
-@app.route('/venues/<int:venue_id>')
+                           search_term=request.form.get('search_term', ''), genre=genre,
+                           genres=VenueForm.genres.kwargs['choices'])
+
+
+@main.route('/venues/availability')
+@max_queries(1)
+def venue_availability():
+    today = date.today()
+    first_day = request.args.get('from', today, type=date.fromisoformat)
+    last_day = request.args.get('to', first_day + timedelta(days=13), type=date.fromisoformat)
+    max_days = current_app.config['AVAILABILITY_MAX_DAYS']
+    last_day = max(first_day, min(last_day, first_day + timedelta(days=max_days - 1)))
+    filters = {name: request.args.get(name, '').strip() for name in ('city', 'state', 'genre')}
+    venues = free_evenings(db.session, Venue, Show, first_day, last_day,
+                           evening=current_app.config['AVAILABILITY_EVENING'],
+                           limit=current_app.config['AVAILABILITY_VENUE_LIMIT'], **filters)
+    return render_template('pages/availability.html', venues=venues, first_day=first_day, last_day=last_day,
+                           filters=filters, states=VenueForm.state.kwargs['choices'],
+                           genres=VenueForm.genres.kwargs['choices'])
+
+
+@main.route('/venues/<int:venue_id>')
+@max_queries(3)
+@cached_page('venue', venue_validators)
 def show_venue(venue_id):
     venue = db.session.query(Venue).get(venue_id)
 
     if not venue:
-        return render_template('errors/404.html')
+        abort(404)
 
-    venue_artists_shows_upcoming = db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id) \
-        .filter(Show.start_time > datetime.now()).all()
+    # upcoming and past shows come from a single query, split by start_time here
+    venue_shows = db.session.query(Show.artist_id, Show.start_time,
+                                   Artist.name.label('artist_name'),
+                                   Artist.image_link.label('artist_image_link')) \
+        .join(Artist).filter(Show.venue_id == venue_id).order_by(Show.start_time).all()
 
+    now = datetime.now()
     shows_upcoming = []
-
-    for show in venue_artists_shows_upcoming:
-        shows_upcoming.append({
-            "artist_id": show.artist_id,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-    venue_artists_shows_history = db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id) \
-        .filter(Show.start_time <= datetime.now()).all()
-
     shows_history = []
 
-    for show in venue_artists_shows_history:
-        shows_history.append({
+    start_times = format_datetimes([show.start_time for show in venue_shows], 'full')
+
+    for show, start_time in zip(venue_shows, start_times):
+        (shows_upcoming if show.start_time > now else shows_history).append({
             "artist_id": show.artist_id,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": start_time
         })
 
     data = {
@@ -212,13 +1088,14 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
+@max_queries(2)
 def create_venue_submission():
 
     is_error = False
@@ -238,6 +1115,8 @@ def create_venue_submission():
         new_venue.seeking_description = request.form['seeking_description']
 
         db.session.add(new_venue)
+        db.session.flush()
+        queue_suggestions(Venue, new_venue.id)
         db.session.commit()
     except:
         is_error = True
@@ -254,12 +1133,17 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+@max_queries(10)
 def delete_venue(venue_id):
     is_error = False
+    artist_ids = []
     try:
-        venue = db.session.query(Venue).get(venue_id)
-        db.session.delete(venue)
+        artist_ids = show_partner_ids(Show.artist_id, Show.venue_id == venue_id)
+        delete_shows(Show.venue_id == venue_id)
+        if not db.session.query(Venue).filter(Venue.id == venue_id).delete(synchronize_session=False):
+            raise LookupError(f'Venue {venue_id} does not exist')
+        queue_suggestions(Venue, venue_id)
         db.session.commit()
     except:
         is_error = True
@@ -271,17 +1155,23 @@ def delete_venue(venue_id):
     if is_error:
         flash(f'An error occurred. Venue could not be deleted')
     else:
+        evict_pages(venue_ids=[venue_id], artist_ids=artist_ids)
         flash(f'Venue was successfully deleted.')
 
     return render_template('pages/home.html')
 
 
-@app.route('/artists/<artist_id>', methods=['DELETE'])
+@main.route('/artists/<artist_id>', methods=['DELETE'])
+@max_queries(10)
 def delete_artist(artist_id):
     is_error = False
+    venue_ids = []
     try:
-        artist = db.session.query(Artist).get(artist_id)
-        db.session.delete(artist)
+        venue_ids = show_partner_ids(Show.venue_id, Show.artist_id == artist_id)
+        delete_shows(Show.artist_id == artist_id)
+        if not db.session.query(Artist).filter(Artist.id == artist_id).delete(synchronize_session=False):
+            raise LookupError(f'Artist {artist_id} does not exist')
+        queue_suggestions(Artist, artist_id)
         db.session.commit()
     except:
         is_error = True
@@ -293,6 +1183,7 @@ def delete_artist(artist_id):
     if is_error:
         flash(f'An error occurred. Artist could not be deleted')
     else:
+        evict_pages(artist_ids=[artist_id], venue_ids=venue_ids)
         flash(f'Artist was successfully deleted.')
 
     return render_template('pages/home.html')
@@ -300,65 +1191,67 @@ def delete_artist(artist_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@max_queries(2)
+@conditional(lambda: listing_validators(Artist))
 def artists():
-    data = db.session.query(Artist).all()
-    return render_template('pages/artists.html', artists=data)
+    query = db.session.query(Artist.id, Artist.name)
+    page = paginate(query, [Artist.name, Artist.id], key=lambda row: (row.name, row.id))
+    return render_template('pages/artists.html', artists=page.items, page=page)
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@read_only
+@max_queries(1)
 def search_artists():
     search_term = request.form.get('search_term', '')
-    result = db.session.query(Artist).filter(Artist.name.ilike(f'%{search_term}%')).all()
+    genre = request.form.get('genre', '')
+    result = search(db.session, Artist, search_term, limit=current_app.config['SEARCH_LIMIT'],
+                    columns=[Artist.id, Artist.name, Artist.upcoming_shows_count], genre=genre or None)
     data = []
 
     for artist in result:
         data.append({
             "id": artist.id,
             "name": artist.name,
-            "num_upcoming_shows": len(
-                db.session.query(Show).filter(Show.venue_id == artist.id).filter(
-                    Show.start_time > datetime.now()).all())
+            "num_upcoming_shows": artist.upcoming_shows_count
         })
     response = {
         "count": len(result),
         "data": data
     }
     return render_template('pages/search_artists.html', results=response,
-                           search_term=request.form.get('search_term', ''))
+                           search_term=request.form.get('search_term', ''), genre=genre,
+                           genres=VenueForm.genres.kwargs['choices'])
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@max_queries(3)
+@cached_page('artist', artist_validators)
 def show_artist(artist_id):
     artist = db.session.query(Artist).get(artist_id)
 
     if not artist:
-        return render_template('errors/404.html')
+        abort(404)
 
-    venue_artists_shows_upcoming = db.session.query(Show).join(Venue).filter(Show.artist_id == artist_id) \
-        .filter(Show.start_time > datetime.now()).all()
+    # upcoming and past shows come from a single query, split by start_time here
+    artist_shows = db.session.query(Show.venue_id, Show.start_time,
+                                    Venue.name.label('venue_name'),
+                                    Venue.image_link.label('venue_image_link')) \
+        .join(Venue).filter(Show.artist_id == artist_id).order_by(Show.start_time).all()
 
+    now = datetime.now()
     shows_upcoming = []
-
-    for show in venue_artists_shows_upcoming:
-        shows_upcoming.append({
-            "venue_id": show.venue_id,
-            "venue_name": show.Venue.name,
-            "venue_image_link": show.Venue.image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-    venue_artists_shows_history = db.session.query(Show).join(Venue).filter(Show.artist_id == artist_id) \
-        .filter(Show.start_time <= datetime.now()).all()
-
     shows_history = []
 
-    for show in venue_artists_shows_history:
-        shows_history.append({
+    start_times = format_datetimes([show.start_time for show in artist_shows], 'full')
+
+    for show, start_time in zip(artist_shows, start_times):
+        (shows_upcoming if show.start_time > now else shows_history).append({
             "venue_id": show.venue_id,
-            "venue_name": show.Venue.name,
-            "venue_image_link": show.Venue.image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
+            "start_time": start_time
         })
 
     data = {
@@ -381,9 +1274,71 @@ def show_artist(artist_id):
     return render_template('pages/show_artist.html', artist=data)
 
 
+#  Genres
+#  ----------------------------------------------------------------
+
+# the model each kind of genre page lists and the sort key it is paginated by
+GENRE_PAGES = {
+    'venues': (Venue, [Venue.state, Venue.city, Venue.id]),
+    'artists': (Artist, [Artist.name, Artist.id]),
+}
+
+
+@main.route('/genres/<genre>', defaults={'kind': 'venues'})
+@main.route('/genres/<genre>/<any(venues, artists):kind>')
+@max_queries(3)
+@conditional(lambda: listing_validators(GENRE_PAGES[request.view_args['kind']][0]))
+def show_genre(genre, kind):
+    if genre not in dict(VenueForm.genres.kwargs['choices']):
+        abort(404)
+    model, columns = GENRE_PAGES[kind]
+    state = request.args.get('state', '').strip()
+    genres, states = genre_facets(db.session, genre_counts(model), genre, state)
+
+    # the GIN index on genres finds the rows of a rare genre, the sort key index walks those of a common one
+    query = db.session.query(model.id, model.name, model.city, model.state).filter(has_genre(model, genre))
+    if state:
+        query = query.filter(model.state == state)
+    page = paginate(query, columns, key=lambda row: tuple(getattr(row, column.key) for column in columns))
+    return render_template('pages/genre.html', genre=genre, kind=kind, state=state, items=page.items, page=page,
+                           total=states.get(state, 0) if state else sum(states.values()),
+                           genres=genres, states=states)
+
+
+#  Suggestions
+#  ----------------------------------------------------------------
+
+def render_suggestions(model, entity_id):
+    partner, seeking, suggestion, owner_column, partner_column = SUGGESTION_SIDES[model]
+    owner = db.session.query(model.id, model.name, seeking.label('seeking')).filter(model.id == entity_id).first()
+    if owner is None:
+        abort(404)
+    # the partners deleted, or no longer seeking, since the lists were computed drop out here
+    suggestions = db.session.query(partner.id, partner.name, partner.city, partner.state, partner.genres,
+                                   partner.image_link, partner.seeking_description) \
+        .join(suggestion, partner_column == partner.id) \
+        .filter(owner_column == entity_id, SUGGESTION_SIDES[partner][1].is_(True)) \
+        .order_by(suggestion.score.desc(), partner.id).all()
+    return render_template('pages/suggestions.html', owner=owner, suggestions=suggestions,
+                           kind=model.__tablename__.lower(), partner_kind=partner.__tablename__.lower())
+
+
+@main.route('/venues/<int:venue_id>/suggested-artists')
+@max_queries(2)
+def suggested_artists(venue_id):
+    return render_suggestions(Venue, venue_id)
+
+
+@main.route('/artists/<int:artist_id>/suggested-venues')
+@max_queries(2)
+def suggested_venues(artist_id):
+    return render_suggestions(Artist, artist_id)
+
+
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@max_queries(1)
 def edit_artist(artist_id):
     form = ArtistForm()
     artist = db.session.query(Artist).get(artist_id)
@@ -406,10 +1361,12 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@max_queries(4)
 def edit_artist_submission(artist_id):
     is_error = False
     artist = db.session.query(Artist).get(artist_id)
+    venue_ids = []
 
     try:
         artist.name = request.form['name']
@@ -422,6 +1379,8 @@ def edit_artist_submission(artist_id):
         artist.image_link = request.form['image_link']
         artist.seeking_venue = True if 'seeking_venue' in request.form else False
         artist.seeking_description = request.form['seeking_description']
+        venue_ids = show_partner_ids(Show.venue_id, Show.artist_id == artist_id)
+        queue_suggestions(Artist, artist_id)
         db.session.commit()
     except:
         is_error = True
@@ -431,14 +1390,16 @@ def edit_artist_submission(artist_id):
         db.session.close()
 
     if is_error:
-        flash(f'An error occurred. Artist {artist.name} could not be updated.')
+        flash(f'An error occurred. Artist {request.form.get("name")} could not be updated.')
     else:
-        flash(f'Artist {artist.name} is updated successfully!')
+        evict_pages(artist_ids=[artist_id], venue_ids=venue_ids)
+        flash(f'Artist {request.form.get("name")} is updated successfully!')
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@max_queries(1)
 def edit_venue(venue_id):
     form = VenueForm()
     venue = db.session.query(Venue).get(venue_id)
@@ -462,10 +1423,12 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@max_queries(4)
 def edit_venue_submission(venue_id):
     is_error = False
     venue = db.session.query(Venue).get(venue_id)
+    artist_ids = []
 
     try:
         venue.name = request.form['name']
@@ -479,6 +1442,8 @@ def edit_venue_submission(venue_id):
         venue.image_link = request.form['image_link']
         venue.seeking_talent = True if 'seeking_talent' in request.form else False
         venue.seeking_description = request.form['seeking_description']
+        artist_ids = show_partner_ids(Show.artist_id, Show.venue_id == venue_id)
+        queue_suggestions(Venue, venue_id)
         db.session.commit()
     except:
         is_error = True
@@ -488,23 +1453,25 @@ def edit_venue_submission(venue_id):
         db.session.close()
 
     if is_error:
-        flash(f'An error occurred. Venue {venue.name} could not be updated.')
+        flash(f'An error occurred. Venue {request.form.get("name")} could not be updated.')
     else:
-        flash(f'Venue {venue.name} is updated successfully!')
+        evict_pages(venue_ids=[venue_id], artist_ids=artist_ids)
+        flash(f'Venue {request.form.get("name")} is updated successfully!')
 
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
+@max_queries(2)
 def create_artist_submission():
     is_error = False
 
@@ -522,6 +1489,8 @@ def create_artist_submission():
         new_artist.seeking_description = request.form['seeking_description']
 
         db.session.add(new_artist)
+        db.session.flush()
+        queue_suggestions(Artist, new_artist.id)
         db.session.commit()
     except:
         is_error = True
@@ -541,42 +1510,59 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@max_queries(2)
+@conditional(lambda: listing_validators(Show, Venue, Artist))
 def shows():
-    all_shows = db.session.query(Show).join(Artist).join(Venue).all()
+    query = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                             Show.artist_id, Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link')) \
+        .join(Artist).join(Venue)
+    page = paginate(query, [Show.start_time, Show.id], key=lambda row: (row.start_time, row.id))
 
     data = []
+    start_times = format_datetimes([show.start_time for show in page], 'full')
 
-    for show in all_shows:
+    for show, start_time in zip(page, start_times):
         data.append({
             "venue_id": show.venue_id,
-            "venue_name": show.Venue.name,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": start_time
         })
 
-    return render_template('pages/shows.html', shows=data)
+    return render_template('pages/shows.html', shows=data, page=page)
 
 
-@app.route('/shows/create')
+@main.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
+@max_queries(5)
 def create_show_submission():
     is_error = False
+    is_double_booking = False
     try:
         new_show = Show()
         new_show.artist_id = request.form['artist_id']
         new_show.venue_id = request.form['venue_id']
-        new_show.start_time = request.form['start_time']
+        new_show.start_time = dateutil.parser.parse(request.form['start_time'])
 
         db.session.add(new_show)
+        db.session.flush()
+        add_show_to_counters(new_show)
         db.session.commit()
+    except exc.IntegrityError as error:
+        is_error = True
+        is_double_booking = error.orig.pgcode == errorcodes.EXCLUSION_VIOLATION
+        db.session.rollback()
+        print(sys.exc_info())
     except:
         is_error = True
         db.session.rollback()
@@ -584,33 +1570,264 @@ def create_show_submission():
     finally:
         db.session.close()
 
-    if is_error:
+    if is_double_booking:
+        flash('The venue already has a show at that time. Show could not be listed.')
+    elif is_error:
         flash(f'An error occurred. Show could not be listed.')
     else:
+        evict_pages(venue_ids=[request.form['venue_id']], artist_ids=[request.form['artist_id']])
         flash(f'Show was successfully listed')
 
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  API
+#  ----------------------------------------------------------------
+
+@main.route('/api/v1/venues')
+def api_venues():
+    query = db.session.query(Venue.id, Venue.name, Venue.genres, Venue.city, Venue.state, Venue.address,
+                             Venue.phone, Venue.website, Venue.image_link, Venue.facebook_link,
+                             Venue.seeking_talent, Venue.seeking_description,
+                             Venue.upcoming_shows_count, Venue.past_shows_count)
+    return stream_rows(query, Venue.id)
+
+
+@main.route('/api/v1/artists')
+def api_artists():
+    query = db.session.query(Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone,
+                             Artist.website, Artist.image_link, Artist.facebook_link,
+                             Artist.seeking_venue, Artist.seeking_description,
+                             Artist.upcoming_shows_count, Artist.past_shows_count)
+    return stream_rows(query, Artist.id)
+
+
+@main.route('/api/v1/shows')
+def api_shows():
+    query = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                             Show.artist_id, Artist.name.label('artist_name')) \
+        .join(Venue).join(Artist)
+    return stream_rows(query, Show.id)
+
+
+#  Images
+#  ----------------------------------------------------------------
+
+IMAGE_MODELS = {'venue': Venue, 'artist': Artist}
+
+
+def send_cached_image(path):
+    # the URL carries the version of the image link, so it never changes content
+    response = send_file(path, mimetype='image/jpeg', conditional=True, cache_timeout=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@main.route('/img/<kind>/<int:entity_id>/<size>')
+@max_queries(1)
+def image(kind, entity_id, size):
+    model = IMAGE_MODELS.get(kind)
+    box = current_app.config['IMAGE_SIZES'].get(size)
+    if model is None or box is None:
+        abort(404)
+
+    # a cached file only exists under a version that was checked against the database
+    version = request.args.get('v', '')
+    key = f'{kind}-{entity_id}-{size}-{version}.jpg'
+    path = image_cache.get(key) if version.isalnum() else None
+    if path is not None:
+        return send_cached_image(path)
+
+    link = db.session.query(model.image_link).filter(model.id == entity_id).scalar()
+    if not link:
+        abort(404)
+    if version != image_version(link):
+        return redirect(image_url(kind, entity_id, link, size))
+    # give the connection back to the pool for the slow fetch from the origin
+    db.session.close()
+
+    try:
+        data = resize(fetch(link, current_app.config['IMAGE_MAX_SOURCE_BYTES'],
+                            current_app.config['IMAGE_FETCH_TIMEOUT'],
+                            current_app.config['IMAGE_ALLOW_PRIVATE_ORIGINS']), box)
+    except OriginError as error:
+        current_app.logger.warning(f'image proxy: {error}')
+        abort(502)
+    return send_cached_image(image_cache.set(key, data))
+
+
+#  Built assets
+#  ----------------------------------------------------------------
+
+@main.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    # fingerprinted names never change content, so clients may keep them for good;
+    # a precompressed variant is served when the client accepts it
+    dist = os.path.join(current_app.static_folder, assets.DIST)
+    response = None
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetypes.guess_type(filename)[0])
+            response.content_encoding = encoding
+            break
+    if response is None:
+        response = send_from_directory(dist, filename)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@main.route('/metrics')
+def metrics():
+    pool = db.engine.pool
+    # only TimedQueuePool times its checkouts
+    db_pool = pool.stats() if isinstance(pool, TimedQueuePool) else {'status': pool.status()}
+    replicas = current_app.extensions.get('replicas')
+    return jsonify(page_cache=page_cache.stats(), db_pool=db_pool, replicas=replicas.stats() if replicas else [])
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@main.cli.command('roll-show-counters')
+def roll_show_counters_command():
+    """Move shows that have started since the last run from upcoming to past."""
+    moved = roll_show_counters()
+    db.session.commit()
+    click.echo(f'{moved} show(s) moved from upcoming to past.')
+
+
+@main.cli.command('reconcile-show-counters')
+@click.option('--dry-run', is_flag=True, help='Report drift without fixing it.')
+def reconcile_show_counters_command(dry_run):
+    """Recompute the upcoming/past show counters and report any drift."""
+    drift = reconcile_show_counters(fix=not dry_run)
+    for model, owner_id, upcoming, past, actual_upcoming, actual_past in drift:
+        click.echo(f'{model} {owner_id}: upcoming {upcoming} -> {actual_upcoming}, past {past} -> {actual_past}')
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    click.echo(f'{len(drift)} counter row(s) drifted.')
+
+
+@main.cli.command('partition-shows')
+@click.option('--months-ahead', type=int, help='Months to create partitions for, from the current one on.')
+@click.option('--archive-after', type=int, help='Archive the partitions that ended more than this many months ago.')
+def partition_shows_command(months_ahead, archive_after):
+    """Create the coming monthly Show partitions and archive old ones."""
+    if months_ahead is None:
+        months_ahead = current_app.config['SHOW_PARTITION_MONTHS_AHEAD']
+    if archive_after is None:
+        archive_after = current_app.config['SHOW_ARCHIVE_AFTER_MONTHS']
+    created = ensure_show_partitions(months_ahead)
+    archived = archive_show_partitions(add_months(date.today(), -archive_after)) if archive_after is not None else []
+    db.session.commit()
+    click.echo(f'{len(created)} partition(s) created: {", ".join(created) or "none"}.')
+    click.echo(f'{len(archived)} partition(s) archived: {", ".join(archived) or "none"}.')
+
+
+@main.cli.command('refresh-venue-listing')
+@click.option('--force', is_flag=True, help='Refresh even if no venue changed.')
+def refresh_venue_listing_command(force):
+    """Refresh the materialized view behind /venues if venues changed since the last refresh."""
+    refreshed = refresh_venue_listing(force)
+    db.session.commit()
+    click.echo('VenueListing refreshed.' if refreshed else 'VenueListing is current.')
+
+
+@main.cli.command('update-suggestions')
+@click.option('--full', is_flag=True, help='Recompute every suggestion, not only the ones profile changes affect.')
+def update_suggestions_command(full):
+    """Recompute the artist and venue suggestions that profiles changed since the last run affect."""
+    recomputed = update_suggestions(full)
+    db.session.commit()
+    click.echo(f'{recomputed["Venue"]} venue(s) and {recomputed["Artist"]} artist(s) got new suggestions.')
+
+
+@main.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per COPY and transaction.')
+def import_command(kind, path, batch_size):
+    """Bulk load venues, artists or shows from a CSV or JSON-lines file."""
+    loaded, errors = import_records(kind, path, batch_size)
+    for line_number, error in sorted(errors):
+        click.echo(f'{path}:{line_number}: {error}', err=True)
+    click.echo(f'{loaded} {kind} imported, {len(errors)} rejected.')
+
+
+@main.cli.command('seed')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=200, show_default=True)
+@click.option('--shows', default=2000, show_default=True)
+@click.option('--seed', type=int, help='Random seed, for a reproducible data set.')
+@click.confirmation_option(prompt='This deletes every venue, artist and show. Continue?')
+def seed_command(venues, artists, shows, seed):
+    """Fill the database with synthetic venues, artists and shows."""
+    if shows and not (venues and artists):
+        raise click.BadParameter('shows need at least one venue and one artist', param_hint='--shows')
+    try:
+        seed_database(venues, artists, shows, seed)
+    except ValueError as error:
+        raise click.BadParameter(f'{error}; give fewer shows or more venues', param_hint='--shows')
+    click.echo(f'Seeded {venues} venues, {artists} artists and {shows} shows.')
+
+
+@main.cli.command('build-assets')
+def build_assets_command():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    for name, files in assets.build(current_app.static_folder).items():
+        click.echo(name)
+        for path, size in files.items():
+            click.echo(f'    {path} {size} bytes')
+    if assets.brotli is None:
+        click.echo('brotli is not installed; only gzip variants were written.')
+
+
+def read_routes(venue_id, artist_id):
+    """(method, url, form data) of every read route, for :func:`queryplan.explain_routes`."""
+    return [
+        ('GET', '/venues', None),
+        ('GET', '/artists', None),
+        ('GET', '/shows', None),
+        ('GET', f'/venues/{venue_id}', None),
+        ('GET', f'/artists/{artist_id}', None),
+        ('POST', '/venues/search', {'search_term': 'the'}),
+        ('POST', '/artists/search', {'search_term': 'the'}),
+    ]
+
+
+@main.cli.command('explain-routes')
+def explain_routes_command():
+    """EXPLAIN the queries of every read route and fail on sequential scans."""
+    venue_id = db.session.query(func.min(Venue.id)).scalar()
+    artist_id = db.session.query(func.min(Artist.id)).scalar()
+    if venue_id is None or artist_id is None:
+        raise click.ClickException('Seed the database with venues and artists first.')
+    db.session.rollback()
+
+    routes = read_routes(venue_id, artist_id)
+    found = explain_routes(current_app._get_current_object(), db.engine, routes)
+    for method, url, relation, statement in found:
+        click.echo(f'{method} {url}: sequential scan on "{relation}"\n    {" ".join(statement.split())}')
+    if found:
+        raise click.ClickException(f'{len(found)} sequential scan(s) found.')
+    click.echo(f'No sequential scans in {len(routes)} route(s).')
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -618,11 +1835,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
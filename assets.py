@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# bundle name -> source files, relative to the static folder, in load order
+BUNDLES = {
+    'css/fyyur.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css',
+                      'css/main.quickfix.css'],
+    # loaded in <head>
+    'js/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    # deferred, after jQuery
+    'js/fyyur.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+# files the templates load on their own: the jQuery fallback and the IE 8 shim
+FILES = ['js/libs/jquery-1.11.1.min.js', 'js/libs/respond-1.4.2.min.js']
+
+DIST = 'dist'
+MANIFEST = posixpath.join(DIST, 'manifest.json')
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+_CSS_SPACE_AFTER_COLON = re.compile(r':\s+')
+# the maps are not bundled, so the references would only produce 404s
+_SOURCE_MAP = re.compile(r'^//[#@] sourceMappingURL=.*$', re.M)
+
+
+def minify_css(css):
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = _CSS_SPACE_AROUND.sub(r'\1', css)
+    css = _CSS_SPACE_AFTER_COLON.sub(':', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    # the libraries ship minified; our own few lines only shrink with rjsmin installed
+    return rjsmin.jsmin(js) if rjsmin is not None else js
+
+
+def _rebase_css_urls(css, source, target):
+    """Keep the relative url()s of ``source`` pointing at the same files from ``target``."""
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', 'data:', 'http:', 'https:', '#')):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return f'url({quote}{posixpath.relpath(path, posixpath.dirname(target))}{quote})'
+    return _CSS_URL.sub(rebase, css)
+
+
+def _fingerprinted(name, content):
+    root, ext = posixpath.splitext(name)
+    return posixpath.join(DIST, f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}')
+
+
+def _write(static_folder, path, content):
+    """Write ``content`` and its .gz and .br variants; return the bytes written per file."""
+    full_path = os.path.join(static_folder, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    variants = {path: content, path + '.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[path + '.br'] = brotli.compress(content, quality=11)
+    for variant, data in variants.items():
+        with open(os.path.join(static_folder, variant), 'wb') as asset_file:
+            asset_file.write(data)
+    return {variant: len(data) for variant, data in variants.items()}
+
+
+def build(static_folder):
+    """Bundle, minify and fingerprint the assets into ``static/dist`` and write its manifest.
+
+    Returns {asset name: {written file: size}}. Earlier builds are left in
+    place, so pages rendered before a deploy can still load their assets.
+    """
+    manifest = {}
+    written = {}
+    for name, sources in BUNDLES.items():
+        target = posixpath.join(DIST, name)
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as source_file:
+                text = source_file.read()
+            if name.endswith('.css'):
+                parts.append(minify_css(_rebase_css_urls(text, source, target)))
+            else:
+                parts.append(_SOURCE_MAP.sub('', minify_js(text)).strip())
+        # a file may end without a semicolon, or in a line comment
+        content = ('\n' if name.endswith('.css') else '\n;\n').join(parts).encode('utf-8')
+        manifest[name] = _fingerprinted(name, content)
+        written[name] = _write(static_folder, manifest[name], content)
+
+    for name in FILES:
+        with open(os.path.join(static_folder, name), 'rb') as source_file:
+            content = source_file.read()
+        manifest[name] = _fingerprinted(name, content)
+        written[name] = _write(static_folder, manifest[name], content)
+
+    with open(os.path.join(static_folder, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return written
+
+
+def load_manifest(static_folder):
+    """The {asset name: fingerprinted path} of the last build, or None before the first one."""
+    try:
+        with open(os.path.join(static_folder, MANIFEST)) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import and_, exists, func
+
+from facets import has_genre
+
+
+def free_evenings(session, venue, show, first_day, last_day, evening=(18, 24), city=None, state=None, genre=None,
+                  limit=50):
+    """Return [(venue row, [free days])] from ``first_day`` to ``last_day`` for the first ``limit`` matching venues.
+
+    Rows hold id, name, city and state; venues with no free evening are left
+    out. An evening, (start hour, end hour) of a day, is free when none of the
+    venue's shows overlaps it, tested on Show.during, the range the exclusion
+    constraint against double bookings indexes with GiST. A booking never runs
+    past midnight, so only the shows starting that day can overlap: each test
+    reads one partition, through the (venue_id, start_time) index.
+    """
+    venues = session.query(venue.id, venue.name, venue.city, venue.state)
+    if city:
+        venues = venues.filter(func.lower(venue.city) == city.lower())
+    if state:
+        venues = venues.filter(venue.state == state)
+    if genre:
+        venues = venues.filter(has_genre(venue, genre))
+    venues = venues.order_by(venue.state, venue.city, venue.id).limit(limit).subquery()
+
+    days = session.query(func.generate_series(datetime.combine(first_day, time()), datetime.combine(last_day, time()),
+                                              timedelta(days=1)).label('day')).subquery()
+    booked = exists().where(and_(
+        show.venue_id == venues.c.id,
+        show.start_time >= days.c.day,
+        show.start_time < days.c.day + timedelta(days=1),
+        show.during.op('&&')(func.tsrange(days.c.day + timedelta(hours=evening[0]),
+                                          days.c.day + timedelta(hours=evening[1]))),
+    ))
+    rows = session.query(venues, days.c.day).filter(~booked) \
+        .order_by(venues.c.state, venues.c.city, venues.c.id, days.c.day).all()
+    result = []
+    for _, venue_rows in groupby(rows, key=lambda row: row.id):
+        venue_rows = list(venue_rows)
+        result.append((venue_rows[0], [row.day.date() for row in venue_rows]))
+    return result
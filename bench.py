@@ -0,0 +1,178 @@
+"""Per-route benchmark suite.
+
+Seeds a scratch Postgres database at several sizes, requests every route of
+app.py through the Flask test client and records latency percentiles and
+query counts. Each run is appended to a JSON-lines results file together
+with the current commit, and compared with the last run of another commit:
+
+    python bench.py --database-uri postgresql://localhost/fyyur_bench --sizes 100,1000,10000
+
+The database is wiped at every size; never point this at real data.
+"""
+import argparse
+import json
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+from app import create_app, db, Venue, Artist, seed_database
+
+# a size of N seeds N venues, 2N artists and 20N shows
+ARTISTS_PER_VENUE = 2
+SHOWS_PER_VENUE = 20
+# routes that delete data would empty the data set being measured
+SKIPPED_ENDPOINTS = {'static', 'delete_venue', 'delete_artist'}
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def route_requests(venue_id, artist_id, search_term):
+    """(endpoint, method, url, form data) for every route worth timing."""
+    venue_form = {
+        'name': 'Bench Venue', 'genres': ['Jazz'], 'city': 'New York', 'state': 'NY', 'address': '1 Bench St',
+        'phone': '5550000000', 'website': 'https://bench.example.com', 'image_link': '',
+        'facebook_link': 'https://www.facebook.com/bench', 'seeking_description': '',
+    }
+    artist_form = dict(venue_form, name='Bench Artist')
+    del artist_form['address']
+    show_form = {'venue_id': venue_id, 'artist_id': artist_id,
+                 'start_time': (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')}
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('artists', 'GET', '/artists', None),
+        ('shows', 'GET', '/shows', None),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None),
+        ('suggested_artists', 'GET', f'/venues/{venue_id}/suggested-artists', None),
+        ('suggested_venues', 'GET', f'/artists/{artist_id}/suggested-venues', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': search_term}),
+        ('search_artists', 'POST', '/artists/search', {'search_term': search_term}),
+        ('venue_availability', 'GET', '/venues/availability?city=New%20York', None),
+        ('show_genre', 'GET', '/genres/Jazz', None),
+        ('show_genre_artists', 'GET', '/genres/Jazz/artists?state=NY', None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('create_shows', 'GET', '/shows/create', None),
+        ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+        ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+        ('edit_venue_submission', 'POST', f'/venues/{venue_id}/edit', venue_form),
+        ('edit_artist_submission', 'POST', f'/artists/{artist_id}/edit', artist_form),
+        ('create_venue_submission', 'POST', '/venues/create', venue_form),
+        ('create_artist_submission', 'POST', '/artists/create', artist_form),
+        ('create_show_submission', 'POST', '/shows/create', show_form),
+        ('api_venues', 'GET', '/api/v1/venues', None),
+        ('api_artists', 'GET', '/api/v1/artists', None),
+        ('api_shows', 'GET', '/api/v1/shows', None),
+        ('metrics', 'GET', '/metrics', None),
+    ]
+
+
+def run(app, sizes, repeat, seed):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+    client = app.test_client()
+    results = []
+
+    for size in sizes:
+        seed_database(size, size * ARTISTS_PER_VENUE, size * SHOWS_PER_VENUE, seed)
+        # the most booked venue and artist make for the heaviest detail pages
+        venue_id = db.session.query(func.min(Venue.id)).scalar()
+        artist_id = db.session.query(func.min(Artist.id)).scalar()
+        search_term = db.session.query(Venue.city).filter(Venue.id == venue_id).scalar()
+        db.session.remove()
+
+        requests = route_requests(venue_id, artist_id, search_term)
+        covered = {endpoint for endpoint, _, _, _ in requests} | SKIPPED_ENDPOINTS
+        missing = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                         if rule.endpoint.rpartition('.')[2] not in covered)
+        if missing:
+            print(f'not benchmarked: {", ".join(missing)}')
+
+        for endpoint, method, url, data in requests:
+            timings = []
+            query_counts = []
+            for _ in range(repeat):
+                del statements[:]
+                started = time.perf_counter()
+                response = client.open(url, method=method, data=data)
+                response.get_data()
+                timings.append((time.perf_counter() - started) * 1000)
+                query_counts.append(len(statements))
+            results.append({
+                'size': size,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 0.5), 3),
+                'p90_ms': round(percentile(timings, 0.9), 3),
+                'p99_ms': round(percentile(timings, 0.99), 3),
+                'max_queries': max(query_counts),
+            })
+    return results
+
+
+def load_previous(path, commit):
+    """Return the results of the latest run in ``path`` made at a commit other than ``commit``."""
+    previous = None
+    try:
+        with open(path) as results_file:
+            for line in results_file:
+                run_record = json.loads(line)
+                if run_record['commit'] != commit:
+                    previous = run_record
+    except FileNotFoundError:
+        pass
+    return previous
+
+
+def report(results, previous):
+    baseline = {(row['size'], row['endpoint']): row for row in previous['results']} if previous else {}
+    if previous:
+        print(f'compared with {previous["commit"]} ({previous["timestamp"]})')
+    print(f'{"size":>7} {"endpoint":<26} {"status":>6} {"p50 ms":>9} {"p90 ms":>9} {"p99 ms":>9} {"queries":>7}')
+    for row in results:
+        line = (f'{row["size"]:>7} {row["endpoint"]:<26} {row["status"]:>6} {row["p50_ms"]:>9.2f} '
+                f'{row["p90_ms"]:>9.2f} {row["p99_ms"]:>9.2f} {row["max_queries"]:>7}')
+        before = baseline.get((row['size'], row['endpoint']))
+        if before:
+            change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line += f'  p50 {change:+.0f}%, queries {before["max_queries"]} -> {row["max_queries"]}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-uri', required=True, help='scratch database; it is wiped')
+    parser.add_argument('--sizes', default='100,1000,10000', help='comma separated venue counts')
+    parser.add_argument('--repeat', type=int, default=20, help='requests per route and size')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_results.jsonl')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    commit = current_commit()
+
+    with app.app_context():
+        results = run(app, [int(size) for size in args.sizes.split(',')], args.repeat, args.seed)
+
+    report(results, load_previous(args.output, commit))
+    with open(args.output, 'a') as results_file:
+        results_file.write(json.dumps({'commit': commit, 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                                       'repeat': args.repeat, 'results': results}) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Micro-benchmark of the show time formatting used by the show listings.
+
+Formats the start times of a generated show list three ways: the old path
+(strftime in the route, then dateutil and babel.dates.format_datetime in the
+filter), the cached ``datetime`` filter, and the batch formatter:
+
+    python bench_dateformat.py --shows 1000
+"""
+import argparse
+import random
+import timeit
+
+import babel.dates
+import dateutil.parser
+
+from dateformat import FORMATS, format_datetime, format_datetimes
+from seed import generate_shows
+
+
+def format_uncached(value, format='full'):
+    return babel.dates.format_datetime(dateutil.parser.parse(value), FORMATS[format])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shows', type=int, default=1000, help='start times per list')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    start_times = [show['start_time']
+                   for show in generate_shows(random.Random(args.seed), args.shows, 100, 200)]
+    candidates = [
+        ('strftime + dateutil + babel', lambda: [format_uncached(value.strftime('%Y-%m-%d %H:%M:%S'))
+                                                 for value in start_times]),
+        ('cached filter', lambda: [format_datetime(value, 'full') for value in start_times]),
+        ('batch', lambda: format_datetimes(start_times, 'full')),
+    ]
+    assert len({tuple(run()) for _, run in candidates}) == 1
+
+    baseline = None
+    print(f'{"formatter":<30} {"ms per list":>12} {"us per show":>12} {"speedup":>8}')
+    for name, run in candidates:
+        seconds = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print(f'{name:<30} {seconds * 1000:>12.2f} {seconds / args.shows * 1e6:>12.2f} '
+              f'{baseline / seconds:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
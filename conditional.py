@@ -0,0 +1,45 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response
+
+
+def as_utc(moment):
+    # naive datetimes, like Show.start_time, are local time; HTTP dates have whole seconds
+    return moment.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def make_validators(salt, *parts):
+    """Return (etag, last_modified) for a page built from ``parts``.
+
+    ``parts`` are whatever the page changes with: row timestamps, counts,
+    the request path. The latest datetime among them is the Last-Modified.
+    """
+    etag = hashlib.sha1(repr((salt,) + parts).encode()).hexdigest()
+    moments = [as_utc(part) for part in parts if isinstance(part, datetime)]
+    return etag, max(moments) if moments else None
+
+
+def is_not_modified(request, etag, last_modified):
+    """Whether the client's copy is current; If-None-Match wins over If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # caches may keep the page but must ask again before every reuse
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified):
+    return add_validators(Response(status=304), etag, last_modified)
@@ -0,0 +1,2 @@
+# the query_budget fixture
+pytest_plugins = ['querybudget']
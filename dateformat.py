@@ -0,0 +1,49 @@
+from datetime import date, datetime, time
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+# the patterns behind format_datetime's named formats
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def _locale(identifier):
+    return Locale.parse(identifier)
+
+
+@lru_cache(maxsize=64)
+def _pattern(format):
+    return babel.dates.parse_pattern(FORMATS.get(format, format))
+
+
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+    """Format a date or datetime, or a string dateutil can parse, with a named format or a babel pattern.
+
+    A date is formatted as its midnight, since the named formats show the
+    time too. The parsed pattern and the locale are built once and reused.
+    """
+    if not isinstance(value, date):
+        value = dateutil.parser.parse(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    return _pattern(format).apply(value, _locale(locale))
+
+
+def format_datetimes(values, format='medium', locale=babel.dates.LC_TIME):
+    """Format many datetimes at once; shows mostly start on the hour, so repeats are formatted once."""
+    pattern = _pattern(format)
+    locale = _locale(locale)
+    formatted = {}
+    result = []
+    for value in values:
+        text = formatted.get(value)
+        if text is None:
+            text = formatted[value] = pattern.apply(value, locale)
+        result.append(text)
+    return result
@@ -0,0 +1,38 @@
+from sqlalchemy import String, func, literal, true
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+def has_genre(model, genre):
+    """``model.genres @> ARRAY[genre]``, the containment test the GIN index on genres answers."""
+    # the column is varchar[]: a text[] operand would rule out the operator, let alone the index
+    return model.genres.op('@>')(literal([genre], ARRAY(String)))
+
+
+def genre_pairs(session, model):
+    """(genre, state, total) of ``model`` counted live, one row for each of its rows and their genres.
+
+    The shape of GenreCount, for databases without the triggers that keep it.
+    """
+    genre = func.unnest(model.genres).label('genre')
+    return session.query(model.id, genre, func.coalesce(model.state, '').label('state'),
+                         literal(1).label('total')).distinct().subquery()
+
+
+def genre_facets(session, counts, genre, state=None):
+    """Return ({genre: count}, {state: count}) from ``counts``, in one grouped query.
+
+    ``counts`` holds (genre, state, total) rows, GenreCount or
+    :func:`genre_pairs`. Each facet leaves out its own filter, so that it
+    lists the alternatives to the current choice: genres are counted in
+    ``state`` (in all states without one) and states in ``genre``. Counts of
+    zero are left out.
+    """
+    in_state = counts.c.state == state if state else true()
+    rows = session.query(counts.c.genre, counts.c.state,
+                         func.sum(counts.c.total).filter(in_state).label('in_state'),
+                         func.sum(counts.c.total).filter(counts.c.genre == genre).label('in_genre')) \
+        .group_by(func.grouping_sets(counts.c.genre, counts.c.state)).all()
+    # the rows grouped by state are the ones without a genre
+    genres = {row.genre: row.in_state for row in rows if row.genre is not None and row.in_state}
+    states = {row.state: row.in_genre for row in rows if row.genre is None and row.in_genre}
+    return genres, states
@@ -0,0 +1,43 @@
+"""gunicorn settings for ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Every value can be overridden from the environment or the command line.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+
+# Pages are rendered in Python and wait on Postgres, so use a couple of
+# synchronous workers per core; each one holds its own connection pool and
+# page cache. Cached pages are checked against the database before they are
+# served, so a write through one worker is never hidden by another's cache.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+# With GUNICORN_WORKER_CLASS=gevent a worker serves up to worker_connections
+# requests at once, switching to another one whenever a request waits on
+# Postgres. It needs gevent and psycogreen; the connection pool
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) still bounds the queries in flight.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+if worker_class == 'gevent':
+    # patch before the app is preloaded, so every lock, socket and
+    # thread-local the app creates is cooperative
+    from gevent import monkey
+    from psycogreen.gevent import patch_psycopg
+    monkey.patch_all()
+    patch_psycopg()
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 2
+
+# Import the app once in the master and fork it, so workers start fast and
+# share the imported code copy-on-write. pooling.protect_pool_across_forks
+# keeps workers from reusing connections opened before the fork.
+preload_app = True
+
+# Recycle workers now and then so a slow leak cannot grow without bound;
+# the jitter keeps them from all restarting at once.
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
+
@@ -0,0 +1,202 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+from functools import partial
+from http.client import HTTPConnection, HTTPSConnection
+from io import BytesIO
+from urllib.parse import urlsplit
+from urllib.request import HTTPHandler, HTTPRedirectHandler, HTTPSHandler, ProxyHandler, Request, build_opener
+
+from PIL import Image
+
+
+class OriginError(Exception):
+    pass
+
+
+class DiskLRUCache(object):
+    """Files in ``directory`` whose total size is kept under ``max_bytes``, least recently read evicted first.
+
+    Recency is the file's atime, set on every hit, so the worker processes
+    sharing the directory also share one LRU order. The mtime stays that of
+    the write, so validators derived from it do not change.
+    """
+
+    def __init__(self, directory, max_bytes, rescan_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self._lock = threading.Lock()
+        # bytes on disk as this process last counted them, and when: the other
+        # workers write to the directory too, so the count is redone now and then
+        self._size = None
+        self._scanned_at = None
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as cache_file:
+            cache_file.write(data)
+        # readers in other workers never see half a file
+        os.replace(temporary, path)
+        with self._lock:
+            if self._size is None or time.monotonic() - self._scanned_at > self.rescan_interval:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _scan(self):
+        """(atime, size, path) of every cached file, least recently read first."""
+        self._scanned_at = time.monotonic()
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.tmp') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another worker meanwhile
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        # down to 90%, so a full cache is not rescanned on every write
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+def check_origin(url, allow_private=False):
+    """Refuse anything but http(s) URLs, and unless ``allow_private``, hosts on private networks.
+
+    Returns the address to connect to, one of those checked, or None when
+    ``allow_private``.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise OriginError(f'not an http(s) URL: {url}')
+    if allow_private:
+        return None
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80),
+                                   type=socket.SOCK_STREAM)
+    except OSError as error:
+        raise OriginError(f'cannot resolve {parts.hostname}: {error}') from error
+    for info in infos:
+        address = info[4][0]
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast:
+            raise OriginError(f'{parts.hostname} resolves to the private address {address}')
+    return infos[0][4][0]
+
+
+class _PinnedConnection(object):
+    """Connects to ``address`` instead of resolving the host again.
+
+    A second lookup could answer with another address than the one checked.
+    The Host header, and for https the SNI and certificate check, still use
+    the host name.
+    """
+
+    def __init__(self, address, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = partial(self._connect_to_address, address)
+
+    def _connect_to_address(self, address, host_port, *args):
+        return socket.create_connection((address, host_port[1]), *args)
+
+
+class _PinnedHTTPConnection(_PinnedConnection, HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnection, HTTPSConnection):
+    pass
+
+
+class _PinnedHTTPHandler(HTTPHandler):
+    def http_open(self, request):
+        # every request, redirects included, comes through here
+        return self.do_open(partial(_PinnedHTTPConnection, check_origin(request.full_url)), request)
+
+
+class _PinnedHTTPSHandler(HTTPSHandler):
+    def https_open(self, request):
+        return self.do_open(partial(_PinnedHTTPSConnection, check_origin(request.full_url)), request,
+                            context=self._context)
+
+
+class _CheckedRedirectHandler(HTTPRedirectHandler):
+    def __init__(self, allow_private):
+        self.allow_private = allow_private
+
+    def redirect_request(self, request, fp, code, msg, headers, newurl):
+        check_origin(newurl, self.allow_private)
+        return super().redirect_request(request, fp, code, msg, headers, newurl)
+
+
+def fetch(url, max_bytes, timeout, allow_private=False):
+    """Download ``url``, following redirects only to origins ``check_origin`` accepts.
+
+    Unless ``allow_private``, each connection goes to the address its check
+    accepted.
+    """
+    check_origin(url, allow_private)
+    handlers = [_CheckedRedirectHandler(allow_private)]
+    if not allow_private:
+        # a proxy would resolve the host itself
+        handlers += [ProxyHandler({}), _PinnedHTTPHandler(), _PinnedHTTPSHandler()]
+    opener = build_opener(*handlers)
+    try:
+        with opener.open(Request(url, headers={'User-Agent': 'Fyyur image proxy'}), timeout=timeout) as response:
+            data = response.read(max_bytes + 1)
+    except (OSError, ValueError) as error:
+        raise OriginError(f'cannot fetch {url}: {error}') from error
+    if len(data) > max_bytes:
+        raise OriginError(f'{url} is larger than {max_bytes} bytes')
+    return data
+
+
+def resize(data, box, quality=82):
+    """Scale the image in ``data`` to fit in ``box`` (width, height) and encode it as a progressive JPEG."""
+    try:
+        image = Image.open(BytesIO(data))
+        # lets the JPEG decoder skip straight to a nearby scale
+        image.draft('RGB', box)
+        image.thumbnail(box, Image.LANCZOS)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise OriginError(f'not a usable image: {error}') from error
+    return output.getvalue()
@@ -0,0 +1,233 @@
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+import dateutil.parser
+from sqlalchemy import select, text
+from wtforms.fields.core import UnboundField
+from wtforms.validators import ValidationError, StopValidation
+
+from forms import VenueForm, ArtistForm, ShowForm
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class _Field(object):
+    """Just enough of a bound WTForms field to run its validators outside a request."""
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def form_rules(form_class):
+    """Map each field of ``form_class`` to the (validators, choices) it declares."""
+    rules = {}
+    for name in dir(form_class):
+        field = getattr(form_class, name)
+        if isinstance(field, UnboundField):
+            choices = field.kwargs.get('choices')
+            rules[name] = (field.kwargs.get('validators') or [],
+                           {value for value, _ in choices} if choices else None)
+    return rules
+
+
+VENUE_RULES = form_rules(VenueForm)
+ARTIST_RULES = form_rules(ArtistForm)
+SHOW_RULES = form_rules(ShowForm)
+
+
+def validate(record, rules):
+    """Run the form ``rules`` over ``record`` and raise a RowError listing every failure."""
+    errors = []
+    for name, (validators, choices) in sorted(rules.items()):
+        value = record.get(name)
+        try:
+            for validator in validators:
+                validator(None, _Field(value))
+        except (ValidationError, StopValidation) as error:
+            errors.append(f'{name}: {error}')
+            continue
+        values = set(value) if isinstance(value, list) else {value}
+        if choices is not None and value and not values <= choices:
+            errors.append(f'{name}: not a valid choice: {", ".join(sorted(values - choices))}')
+    if errors:
+        raise RowError('; '.join(errors))
+
+
+def _parse_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        return RowError(f'not valid JSON: {error}')
+    if not isinstance(record, dict):
+        return RowError('not a JSON object')
+    return record
+
+
+def read_records(path):
+    """Yield (line number, record) from a CSV file with a header row or a JSON-lines file.
+
+    A JSON line that is not an object comes out as a RowError in place of
+    the record, so that one bad line only rejects itself.
+    """
+    with open(path, newline='') as source:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(source, 1):
+                if line.strip():
+                    yield line_number, _parse_line(line)
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(record, name):
+    value = record.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def _flag(record, name):
+    value = record.get(name)
+    return value if isinstance(value, bool) else _text(record, name).lower() in TRUE_VALUES
+
+
+def _genres(record):
+    value = record.get('genres') or []
+    if isinstance(value, str):
+        value = value.split(';')
+    return [genre.strip() for genre in value if genre.strip()]
+
+
+def clean_venue(record):
+    row = {name: _text(record, name) for name in ('name', 'city', 'state', 'address', 'phone', 'website',
+                                                   'image_link', 'facebook_link', 'seeking_description')}
+    row['genres'] = _genres(record)
+    row['seeking_talent'] = _flag(record, 'seeking_talent')
+    validate(row, VENUE_RULES)
+    return row
+
+
+def clean_artist(record):
+    row = {name: _text(record, name) for name in ('name', 'city', 'state', 'phone', 'website',
+                                                   'image_link', 'facebook_link', 'seeking_description')}
+    row['genres'] = _genres(record)
+    row['seeking_venue'] = _flag(record, 'seeking_venue')
+    validate(row, ARTIST_RULES)
+    return row
+
+
+def clean_show(record):
+    """Return a show row whose venue and artist are an id or, failing that, a name."""
+    row = {}
+    for kind in ('venue', 'artist'):
+        owner_id = _text(record, f'{kind}_id')
+        if owner_id:
+            if not owner_id.isdigit():
+                raise RowError(f'{kind}_id: not an integer')
+            row[f'{kind}_id'] = int(owner_id)
+        elif _text(record, kind):
+            row[kind] = _text(record, kind)
+        else:
+            raise RowError(f'{kind}: give either {kind}_id or the {kind} name')
+    try:
+        row['start_time'] = dateutil.parser.parse(_text(record, 'start_time'))
+    except (ValueError, OverflowError):
+        row['start_time'] = None
+    validate(row, {'start_time': SHOW_RULES['start_time']})
+    return row
+
+
+def resolve_names(connection, table, names):
+    """Map each of ``names`` that identifies exactly one row of ``table`` to its id."""
+    ids = {}
+    ambiguous = set()
+    for row_id, name in connection.execute(select([table.c.id, table.c.name]).where(table.c.name.in_(names))):
+        if name in ids:
+            ambiguous.add(name)
+        ids[name] = row_id
+    return {name: row_id for name, row_id in ids.items() if name not in ambiguous}, ambiguous
+
+
+def existing_ids(connection, table, ids):
+    return {row[0] for row in connection.execute(select([table.c.id]).where(table.c.id.in_(ids)))}
+
+
+def booking(start_time):
+    """The (start, end) a show starting at ``start_time`` books its venue for, as Show.during computes it."""
+    return start_time, min(start_time + timedelta(hours=4),
+                           datetime.combine(start_time.date() + timedelta(days=1), time()))
+
+
+def booked_indexes(connection, table, rows):
+    """The indexes of the show ``rows`` that overlap a show of their venue already in ``table``."""
+    if not rows:
+        return set()
+    ranges = [booking(row['start_time']) for row in rows]
+    # a booking ends by midnight, so only shows starting the same day can overlap
+    result = connection.execute(text(f"""
+        SELECT batch.position - 1 FROM unnest(CAST(:venue_ids AS integer[]), CAST(:starts AS timestamp[]),
+                                              CAST(:ends AS timestamp[]))
+            WITH ORDINALITY AS batch (venue_id, start_time, end_time, position)
+        WHERE EXISTS (SELECT 1 FROM "{table.name}" AS show
+                      WHERE show.venue_id = batch.venue_id
+                        AND show.start_time >= date_trunc('day', batch.start_time)
+                        AND show.start_time < date_trunc('day', batch.start_time) + interval '1 day'
+                        AND show.during && tsrange(batch.start_time, batch.end_time))
+    """), venue_ids=[row['venue_id'] for row in rows], starts=[start for start, _ in ranges],
+        ends=[end for _, end in ranges])
+    return {row[0] for row in result}
+
+
+def _copy_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+                              for item in value) + '}'
+    return value
+
+
+def copy_rows(connection, table, columns, rows):
+    """Load ``rows`` (dicts) into ``table`` with COPY on Postgres, executemany elsewhere.
+
+    Empty strings are loaded as NULL, as the HTML forms would leave them.
+    """
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), [{column: row[column] for column in columns} for row in rows])
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
@@ -0,0 +1,105 @@
+import heapq
+import json
+import random
+import time
+
+from flask import current_app, g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestStats(object):
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        # min-heap of (seconds, statement) holding the slowest statements
+        self.slowest = []
+        self.render_time = 0.0
+        self.render_started = []
+
+
+class RequestInstrumentation(object):
+    """Per-request SQL and template timings, published as Server-Timing headers and log records.
+
+    Only a INSTRUMENTATION_SAMPLE_RATE fraction of requests is measured, so
+    the overhead can be kept negligible under full load.
+    """
+
+    def __init__(self, app=None):
+        # engine events are process wide; the per-app hooks decide whether a request is measured
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        app.config.setdefault('INSTRUMENTATION_SLOWEST_STATEMENTS', 3)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+
+    @staticmethod
+    def _stats():
+        return g.get('_request_stats') if has_app_context() else None
+
+    def _start_request(self):
+        if random.random() < current_app.config['INSTRUMENTATION_SAMPLE_RATE']:
+            g._request_stats = RequestStats()
+
+    def _start_render(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is not None:
+            stats.render_started.append(time.perf_counter())
+
+    def _finish_render(self, sender, template, context, **extra):
+        stats = self._stats()
+        if stats is not None and stats.render_started:
+            stats.render_time += time.perf_counter() - stats.render_started.pop()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._stats() is not None:
+            conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._stats()
+        started = conn.info.get('_query_started')
+        if stats is None or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats.query_count += 1
+        stats.sql_time += elapsed
+        heapq.heappush(stats.slowest, (elapsed, statement))
+        if len(stats.slowest) > current_app.config['INSTRUMENTATION_SLOWEST_STATEMENTS']:
+            heapq.heappop(stats.slowest)
+
+    def _finish_request(self, response):
+        stats = self._stats()
+        if stats is None:
+            return response
+
+        total = time.perf_counter() - stats.started
+        # whatever is neither SQL nor template rendering: view code and ORM hydration
+        other = max(total - stats.sql_time - stats.render_time, 0.0)
+        response.headers.add('Server-Timing', ', '.join([
+            f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.query_count} queries"',
+            f'render;dur={stats.render_time * 1000:.2f}',
+            f'app;dur={other * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]))
+        current_app.logger.getChild('instrumentation').info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'query_count': stats.query_count,
+            'render_ms': round(stats.render_time * 1000, 2),
+            'slowest': [{'ms': round(elapsed * 1000, 2), 'statement': ' '.join(statement.split())[:500]}
+                        for elapsed, statement in sorted(stats.slowest, reverse=True)],
+        }))
+        return response
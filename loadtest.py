@@ -0,0 +1,70 @@
+"""Concurrent load test against a running server.
+
+Keeps ``--concurrency`` clients busy on the read pages for ``--duration``
+seconds and reports throughput and latency:
+
+    gunicorn -c gunicorn.conf.py wsgi:app &
+    python loadtest.py --url http://127.0.0.1:8000 --concurrency 32 --duration 20
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+PATHS = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+SEARCHES = [('/venues/search', 'search_term=new'), ('/artists/search', 'search_term=band')]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def client(host, port, deadline, latencies, errors, lock):
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    requests = [('GET', path, None) for path in PATHS] + [('POST', path, body) for path, body in SEARCHES]
+    number = 0
+    while time.perf_counter() < deadline:
+        method, path, body = requests[number % len(requests)]
+        number += 1
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            failed = response.status != 200
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            failed = True
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            errors[0] += failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    clients = [threading.Thread(target=client, args=(url.hostname, url.port or 80, deadline, latencies, errors, lock))
+               for _ in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+
+    print(f'{len(latencies) / args.duration:.1f} requests/s, {errors[0]} errors, '
+          f'p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
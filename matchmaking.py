@@ -0,0 +1,114 @@
+import numpy as np
+
+
+class Profiles(object):
+    """The features of some venues or artists, one row each, in the order of ``ids``.
+
+    ``genres`` has a column per genre and rows of unit length, so the product
+    of two rows is the cosine similarity of their genres. ``states`` and
+    ``cities`` hold the locations, '' where unknown.
+    """
+
+    def __init__(self, ids, genres, states, cities):
+        self.ids = ids
+        self.genres = genres
+        self.states = states
+        self.cities = cities
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, ids):
+        """The profiles of those of ``ids`` that are in this set."""
+        mask = np.isin(self.ids, np.fromiter(ids, dtype=np.int64))
+        return Profiles(self.ids[mask], self.genres[mask], self.states[mask], self.cities[mask])
+
+
+def encode(rows, genres):
+    """Profiles of (id, genres, city, state) rows, with a column for each of ``genres``."""
+    columns = {genre: column for column, genre in enumerate(genres)}
+    matrix = np.zeros((len(rows), len(genres)), dtype=np.float32)
+    cells = [(index, columns[genre]) for index, row in enumerate(rows)
+             for genre in set(row[1] or ()) if genre in columns]
+    if cells:
+        matrix[tuple(np.array(cells).T)] = 1
+    lengths = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, lengths, out=matrix, where=lengths > 0)
+    states = np.array([row[3] or '' for row in rows], dtype=object)
+    # a city is only the same city within one state
+    cities = np.array([f'{row[3]}/{row[2].strip().lower()}' if row[3] and row[2] and row[2].strip() else ''
+                       for row in rows], dtype=object)
+    return Profiles(np.array([row[0] for row in rows], dtype=np.int64), matrix, states, cities)
+
+
+def _codes(left, right):
+    """Integer codes of two arrays of locations, equal where the locations are; unknown ones match nothing."""
+    _, inverse = np.unique(np.concatenate([left, right]), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    left_codes, right_codes = inverse[:len(left)].copy(), inverse[len(left):].copy()
+    left_codes[left == ''] = -1
+    right_codes[right == ''] = -2
+    return left_codes, right_codes
+
+
+def _scorer(owners, partners, weights):
+    """score(start, stop): the scores of ``owners[start:stop]`` against every partner, one row per owner."""
+    owner_states, partner_states = _codes(owners.states, partners.states)
+    owner_cities, partner_cities = _codes(owners.cities, partners.cities)
+
+    def score(start, stop):
+        similarity = owners.genres[start:stop] @ partners.genres.T
+        scores = weights['genre'] * similarity
+        scores += weights['state'] * (owner_states[start:stop, None] == partner_states)
+        scores += weights['city'] * (owner_cities[start:stop, None] == partner_cities)
+        # a venue and an artist with no genre in common are no match, however close
+        scores[similarity <= 0] = 0
+        return scores
+    return score
+
+
+def _batches(owners, partners, batch_cells):
+    size = max(1, batch_cells // max(1, len(partners)))
+    for start in range(0, len(owners), size):
+        yield start, min(start + size, len(owners))
+
+
+def top_matches(owners, partners, count, weights, batch_cells=1 << 24):
+    """Yield (owner id, [(partner id, score)]) for each of ``owners``: its ``count`` best partners, best first.
+
+    A score is the cosine similarity of the genres plus a bonus for the same
+    state and another for the same city, weighed by ``weights`` ('genre',
+    'state', 'city'); partners with no genre in common are left out. Owners
+    are scored a batch at a time, a matrix of at most ``batch_cells`` scores.
+    """
+    score = _scorer(owners, partners, weights)
+    count = min(count, len(partners))
+    for start, stop in _batches(owners, partners, batch_cells):
+        if not count:
+            for owner_id in owners.ids[start:stop].tolist():
+                yield owner_id, []
+            continue
+        scores = score(start, stop)
+        best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for owner_id, columns, row_scores in zip(owners.ids[start:stop].tolist(), best, best_scores):
+            matched = row_scores > 0
+            yield owner_id, list(zip(partners.ids[columns[matched]].tolist(), row_scores[matched].tolist()))
+
+
+def outscored(owners, floors, partners, weights, batch_cells=1 << 24):
+    """The ids of the ``owners`` that one of ``partners`` scores above their floor.
+
+    ``floors`` maps the ids of the owners whose list is full to the lowest
+    score on it; the floor of the others is 0.
+    """
+    score = _scorer(owners, partners, weights)
+    floors = np.array([floors.get(owner_id, 0.0) for owner_id in owners.ids.tolist()])
+    found = set()
+    for start, stop in _batches(owners, partners, batch_cells):
+        above = (score(start, stop) > floors[start:stop, None]).any(axis=1)
+        found.update(owners.ids[start:stop][above].tolist())
+    return found
@@ -0,0 +1,69 @@
+"""add search vectors and trigram indexes
+
+Revision ID: 3f9a2c71d0b8
+Revises: 51c19c71f467
+Create Date: 2026-10-18 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a2c71d0b8'
+down_revision = '51c19c71f467'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the first revision created Artist.genres as a plain string while the
+    # model has always mapped it as an array; align it before indexing it
+    inspector = sa.inspect(op.get_bind())
+    artist_genres = [column for column in inspector.get_columns('Artist') if column['name'] == 'genres'][0]
+    if not isinstance(artist_genres['type'], sa.ARRAY):
+        op.execute('ALTER TABLE "Artist" ALTER COLUMN genres TYPE varchar[] '
+                   "USING string_to_array(trim(both '{}' from genres), ',')")
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("""
+        CREATE FUNCTION fyyur_search_text(name varchar, city varchar, genres varchar[]) RETURNS text
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' ||
+                         coalesce(array_to_string(genres, ' '), ''))
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION fyyur_search_vector_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(array_to_string(NEW.genres, ' '), '')), 'C');
+            RETURN NEW;
+        END
+        $$
+    """)
+
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(f'CREATE TRIGGER "{table}_search_vector_update" '
+                   f'BEFORE INSERT OR UPDATE OF name, city, genres ON "{table}" '
+                   f'FOR EACH ROW EXECUTE PROCEDURE fyyur_search_vector_update()')
+        # fire the trigger once for the existing rows
+        op.execute(f'UPDATE "{table}" SET name = name')
+        op.execute(f'CREATE INDEX "ix_{table}_search_vector" ON "{table}" USING gin (search_vector)')
+        op.execute(f'CREATE INDEX "ix_{table}_search_text_trgm" ON "{table}" '
+                   f'USING gin (fyyur_search_text(name, city, genres) gin_trgm_ops)')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.execute(f'DROP INDEX "ix_{table}_search_text_trgm"')
+        op.execute(f'DROP INDEX "ix_{table}_search_vector"')
+        op.execute(f'DROP TRIGGER "{table}_search_vector_update" ON "{table}"')
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION fyyur_search_vector_update()')
+    op.execute('DROP FUNCTION fyyur_search_text(varchar, varchar, varchar[])')
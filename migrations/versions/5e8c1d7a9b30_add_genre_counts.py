@@ -0,0 +1,95 @@
+"""add GIN indexes on genres and genre counts for the genre facets
+
+Revision ID: 5e8c1d7a9b30
+Revises: b6e0f3a9d724
+Create Date: 2026-10-18 22:05:47.190326
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8c1d7a9b30'
+down_revision = 'b6e0f3a9d724'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist']
+
+# one row per venue or artist and genre; an array that repeats a genre counts once
+PAIRS = "SELECT DISTINCT id, genre, coalesce(state, '') AS state, {delta} AS delta FROM {rows}, unnest(genres) AS genre"
+
+ADD_PAIRS = """
+    INSERT INTO "GenreCount" (kind, genre, state, total)
+    SELECT {kind}, genre, state, sum(delta) FROM ({pairs}) AS pairs
+    GROUP BY genre, state HAVING sum(delta) <> 0
+    ON CONFLICT (kind, genre, state) DO UPDATE SET total = "GenreCount".total + excluded.total
+"""
+
+
+def upgrade():
+    op.create_table('GenreCount',
+    sa.Column('kind', sa.String(length=63), nullable=False),
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'genre', 'state')
+    )
+
+    # statement-level with transition tables, so a bulk import or counter update
+    # costs one grouped upsert; an update that changes no genre or state nets out
+    # to nothing. These fire after "<table>_bump_table_version", which already
+    # queues the writers to the table, and the counts of each table are rows of
+    # their own. A transaction that writes several tables can still deadlock on
+    # the version rows, unless it writes them in the order the app keeps:
+    # Show, Venue, Artist.
+    op.execute(f"""
+        CREATE FUNCTION fyyur_genre_count_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM "GenreCount" WHERE kind = TG_TABLE_NAME;
+            ELSIF TG_OP = 'INSERT' THEN
+                {ADD_PAIRS.format(kind='TG_TABLE_NAME', pairs=PAIRS.format(delta=1, rows='new_rows'))};
+            ELSIF TG_OP = 'DELETE' THEN
+                {ADD_PAIRS.format(kind='TG_TABLE_NAME', pairs=PAIRS.format(delta=-1, rows='old_rows'))};
+            ELSE
+                {ADD_PAIRS.format(kind='TG_TABLE_NAME', pairs=PAIRS.format(delta=1, rows='new_rows')
+                                  + ' UNION ALL ' + PAIRS.format(delta=-1, rows='old_rows'))};
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in TABLES:
+        # transition tables allow one event per trigger
+        op.execute(f'CREATE TRIGGER "{table}_genre_count_insert" AFTER INSERT ON "{table}" '
+                   f'REFERENCING NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_genre_count_update()')
+        op.execute(f'CREATE TRIGGER "{table}_genre_count_update" AFTER UPDATE ON "{table}" '
+                   f'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_genre_count_update()')
+        op.execute(f'CREATE TRIGGER "{table}_genre_count_delete" AFTER DELETE ON "{table}" '
+                   f'REFERENCING OLD TABLE AS old_rows '
+                   f'FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_genre_count_update()')
+        op.execute(f'CREATE TRIGGER "{table}_genre_count_truncate" AFTER TRUNCATE ON "{table}" '
+                   f'FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_genre_count_update()')
+        # the triggers hold off writers until the commit, so no change slips between them and the count
+        op.execute(ADD_PAIRS.format(kind=f"'{table}'", pairs=PAIRS.format(delta=1, rows=f'"{table}"')))
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_genres', table, ['genres'], postgresql_using='gin',
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            op.drop_index(f'ix_{table}_genres', table_name=table, postgresql_concurrently=True)
+    for table in reversed(TABLES):
+        for event in ('truncate', 'delete', 'update', 'insert'):
+            op.execute(f'DROP TRIGGER "{table}_genre_count_{event}" ON "{table}"')
+    op.execute('DROP FUNCTION fyyur_genre_count_update()')
+    op.drop_table('GenreCount')
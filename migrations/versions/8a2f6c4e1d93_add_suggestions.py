@@ -0,0 +1,47 @@
+"""add precomputed artist and venue suggestions
+
+Revision ID: 8a2f6c4e1d93
+Revises: 5e8c1d7a9b30
+Create Date: 2026-10-18 23:48:13.604518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2f6c4e1d93'
+down_revision = '5e8c1d7a9b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('SuggestionQueue',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('kind', sa.String(length=63), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('SuggestedArtist',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('venue_id', 'artist_id')
+    )
+    op.create_index('ix_SuggestedArtist_artist_id', 'SuggestedArtist', ['artist_id'])
+    op.create_table('SuggestedVenue',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('artist_id', 'venue_id')
+    )
+    op.create_index('ix_SuggestedVenue_venue_id', 'SuggestedVenue', ['venue_id'])
+
+
+def downgrade():
+    op.drop_index('ix_SuggestedVenue_venue_id', table_name='SuggestedVenue')
+    op.drop_table('SuggestedVenue')
+    op.drop_index('ix_SuggestedArtist_artist_id', table_name='SuggestedArtist')
+    op.drop_table('SuggestedArtist')
+    op.drop_table('SuggestionQueue')
@@ -0,0 +1,47 @@
+"""add upcoming/past show counters
+
+Revision ID: 9d4e61b3a5c2
+Revises: 3f9a2c71d0b8
+Create Date: 2026-10-18 11:03:27.114590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4e61b3a5c2'
+down_revision = '3f9a2c71d0b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCounterWatermark',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO "ShowCounterWatermark" (id, rolled_at) VALUES (1, now())')
+
+    for table, owner_column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(f'''
+            UPDATE "{table}" SET upcoming_shows_count = counts.upcoming, past_shows_count = counts.past
+            FROM (
+                SELECT "Show".{owner_column} AS owner_id,
+                       count(*) FILTER (WHERE "Show".start_time > watermark.rolled_at) AS upcoming,
+                       count(*) FILTER (WHERE "Show".start_time <= watermark.rolled_at) AS past
+                FROM "Show", "ShowCounterWatermark" AS watermark
+                GROUP BY "Show".{owner_column}
+            ) AS counts
+            WHERE "{table}".id = counts.owner_id
+        ''')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('ShowCounterWatermark')
@@ -0,0 +1,106 @@
+"""partition Show by month of start_time
+
+Revision ID: a43d9e0c5f12
+Revises: e81f4a6b2d07
+Create Date: 2026-10-18 18:05:37.214690
+
+Rebuilds Show as a table range-partitioned by start_time, one partition per
+month from the first show to a year ahead, plus a default partition for
+anything outside them. The rows are copied in one statement, so run it in a
+maintenance window. Needs PostgreSQL 13 or later for the row trigger.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a43d9e0c5f12'
+down_revision = 'e81f4a6b2d07'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_Show_start_time_id', ['start_time', 'id']),
+]
+MONTHS_AHEAD = 12
+
+
+def create_show_table(partitioned):
+    # the primary key of a partitioned table has to include the partition key
+    op.execute(f"""
+        CREATE TABLE "Show" (
+            id integer NOT NULL DEFAULT nextval('"Show_id_seq"'::regclass),
+            artist_id integer NOT NULL REFERENCES "Artist" (id),
+            venue_id integer NOT NULL REFERENCES "Venue" (id),
+            start_time timestamp without time zone NOT NULL,
+            updated_at timestamp with time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY {'(id, start_time)' if partitioned else '(id)'}
+        ){' PARTITION BY RANGE (start_time)' if partitioned else ''}
+    """)
+
+
+def finish_show_table():
+    """Copy the rows over from Show_old, then move the sequence, indexes and triggers and drop it."""
+    op.execute('INSERT INTO "Show" (id, artist_id, venue_id, start_time, updated_at) '
+               'SELECT id, artist_id, venue_id, start_time, updated_at FROM "Show_old"')
+    # the sequence would go with the table that owns it
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.execute('DROP TABLE "Show_old"')
+    for name, columns in INDEXES:
+        op.create_index(name, 'Show', columns)
+    op.execute('CREATE TRIGGER "Show_touch_updated_at" BEFORE UPDATE ON "Show" '
+               'FOR EACH ROW EXECUTE PROCEDURE fyyur_touch_updated_at()')
+    op.execute('CREATE TRIGGER "Show_bump_table_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+               'ON "Show" FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_bump_table_version()')
+    op.execute('UPDATE "TableVersion" SET changed_at = clock_timestamp() WHERE table_name = \'Show\'')
+
+
+def upgrade():
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_old"')
+    op.execute('ALTER INDEX "Show_pkey" RENAME TO "Show_old_pkey"')
+    for name, _ in INDEXES:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_old"')
+    create_show_table(partitioned=True)
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+
+    # also used by `flask partition-shows`; shows already filed in the default
+    # partition move to the new one, as ATTACH refuses to leave them there
+    op.execute("""
+        CREATE FUNCTION fyyur_ensure_show_partition(month date) RETURNS boolean LANGUAGE plpgsql AS $$
+        DECLARE
+            lower_bound date := date_trunc('month', month);
+            upper_bound date := lower_bound + interval '1 month';
+            partition_name text := 'Show_' || to_char(lower_bound, 'YYYY_MM');
+        BEGIN
+            IF to_regclass(format('%I', partition_name)) IS NOT NULL THEN
+                RETURN false;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE "Show" INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format('WITH moved AS (DELETE FROM "Show_default" WHERE start_time >= %L AND start_time < %L '
+                           'RETURNING *) INSERT INTO %I SELECT * FROM moved', lower_bound, upper_bound, partition_name);
+            EXECUTE format('ALTER TABLE "Show" ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, lower_bound, upper_bound);
+            RETURN true;
+        END
+        $$
+    """)
+    op.execute(f"""
+        SELECT fyyur_ensure_show_partition(month::date)
+        FROM generate_series(
+            date_trunc('month', least((SELECT min(start_time) FROM "Show_old"), now()::timestamp)),
+            date_trunc('month', now()) + interval '{MONTHS_AHEAD} months',
+            interval '1 month') AS month
+    """)
+    finish_show_table()
+
+
+def downgrade():
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_old"')
+    op.execute('ALTER INDEX "Show_pkey" RENAME TO "Show_old_pkey"')
+    for name, _ in INDEXES:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_old"')
+    create_show_table(partitioned=False)
+    finish_show_table()
+    op.execute('DROP FUNCTION fyyur_ensure_show_partition(date)')
@@ -0,0 +1,31 @@
+"""make the columns the listings are paged by NOT NULL
+
+Revision ID: b1e7c3d59a06
+Revises: f3b8d2a6c914
+Create Date: 2026-10-19 11:02:17.540982
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1e7c3d59a06'
+down_revision = 'f3b8d2a6c914'
+branch_labels = None
+depends_on = None
+
+# a NULL in a row comparison makes it NULL, so keyset pagination would skip the row
+COLUMNS = [('Venue', 'state'), ('Venue', 'city'), ('Artist', 'name')]
+
+
+def upgrade():
+    # Venue before Artist, the order the version triggers lock in
+    for table, column in COLUMNS:
+        op.execute(f'UPDATE "{table}" SET "{column}" = \'\' WHERE "{column}" IS NULL')
+    for table, column in COLUMNS:
+        op.alter_column(table, column, nullable=False)
+
+
+def downgrade():
+    for table, column in reversed(COLUMNS):
+        op.alter_column(table, column, nullable=True)
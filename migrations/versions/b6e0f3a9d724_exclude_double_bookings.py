@@ -0,0 +1,93 @@
+"""add Show.during and an exclusion constraint against double bookings
+
+Revision ID: b6e0f3a9d724
+Revises: d5b27e8f3c41
+Create Date: 2026-10-18 20:31:05.846213
+
+A show books its venue for four hours from its start, cut off at midnight.
+Postgres has no exclusion constraints on partitioned tables before 17, so
+every partition gets its own; cut off at midnight, a booking never leaves
+the partition of its start_time, and the per-partition constraints cover
+all of Show.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e0f3a9d724'
+down_revision = 'd5b27e8f3c41'
+branch_labels = None
+depends_on = None
+
+DURING = "tsrange(start_time, least(start_time + interval '4 hours', date_trunc('day', start_time) + interval '1 day'))"
+
+# a booking overlaps another of the venue only if it overlaps the one that starts just before it
+DOUBLE_BOOKINGS = """
+    SELECT venue_id, previous_id, id FROM (
+        SELECT venue_id, id, during,
+               lag(id) OVER bookings AS previous_id, lag(during) OVER bookings AS previous_during
+        FROM "Show" WINDOW bookings AS (PARTITION BY venue_id ORDER BY start_time, id)
+    ) AS bookings
+    WHERE during && previous_during
+    ORDER BY venue_id, id
+    LIMIT 20
+"""
+
+ENSURE_SHOW_PARTITION = """
+    CREATE OR REPLACE FUNCTION fyyur_ensure_show_partition(month date) RETURNS boolean LANGUAGE plpgsql AS $$
+    DECLARE
+        lower_bound date := date_trunc('month', month);
+        upper_bound date := lower_bound + interval '1 month';
+        partition_name text := 'Show_' || to_char(lower_bound, 'YYYY_MM');
+    BEGIN
+        IF to_regclass(format('%I', partition_name)) IS NOT NULL THEN
+            RETURN false;
+        END IF;
+        EXECUTE format('CREATE TABLE %I (LIKE "Show" INCLUDING DEFAULTS INCLUDING GENERATED)', partition_name);
+        {exclude}
+        EXECUTE format('WITH moved AS (DELETE FROM "Show_default" WHERE start_time >= %L AND start_time < %L '
+                       'RETURNING *) INSERT INTO %I (id, artist_id, venue_id, start_time, updated_at) '
+                       'SELECT id, artist_id, venue_id, start_time, updated_at FROM moved',
+                       lower_bound, upper_bound, partition_name);
+        EXECUTE format('ALTER TABLE "Show" ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, lower_bound, upper_bound);
+        RETURN true;
+    END
+    $$
+"""
+
+
+def upgrade():
+    # for the equality on venue_id in the GiST index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(f'ALTER TABLE "Show" ADD COLUMN during tsrange GENERATED ALWAYS AS ({DURING}) STORED')
+
+    conflicts = op.get_bind().execute(sa.text(DOUBLE_BOOKINGS)).fetchall()
+    if conflicts:
+        raise RuntimeError('Move or delete these double bookings first: ' + ', '.join(
+            f'venue {venue_id}: shows {first} and {second}' for venue_id, first, second in conflicts))
+
+    op.execute("""
+        CREATE FUNCTION fyyur_exclude_double_bookings(partition_name text) RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (venue_id WITH =, during WITH &&)',
+                           partition_name, partition_name || '_no_double_booking');
+        END
+        $$
+    """)
+    op.execute("""
+        SELECT fyyur_exclude_double_bookings(child.relname)
+        FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = '"Show"'::regclass
+    """)
+    # new partitions get the constraint before the shows from the default partition move in
+    op.execute(ENSURE_SHOW_PARTITION.format(exclude='PERFORM fyyur_exclude_double_bookings(partition_name);'))
+
+
+def downgrade():
+    op.execute(ENSURE_SHOW_PARTITION.format(exclude=''))
+    op.execute('DROP FUNCTION fyyur_exclude_double_bookings(text)')
+    # takes the constraints of the attached partitions with it
+    op.execute('ALTER TABLE "Show" DROP COLUMN during')
@@ -0,0 +1,40 @@
+"""add composite indexes for the hot read paths
+
+Revision ID: c7b05e2f8a19
+Revises: 9d4e61b3a5c2
+Create Date: 2026-10-18 13:41:52.630871
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7b05e2f8a19'
+down_revision = '9d4e61b3a5c2'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # detail pages and counter maintenance: shows of one venue/artist by time
+    ('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time']),
+    # keyset pagination of /shows and the counter roll-forward window
+    ('ix_Show_start_time_id', 'Show', ['start_time', 'id']),
+    # keyset pagination and grouping of /venues by area
+    ('ix_Venue_state_city_id', 'Venue', ['state', 'city', 'id']),
+    # keyset pagination of /artists
+    ('ix_Artist_name_id', 'Artist', ['name', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
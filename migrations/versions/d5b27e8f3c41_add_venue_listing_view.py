@@ -0,0 +1,33 @@
+"""add the VenueListing materialized view behind /venues
+
+Revision ID: d5b27e8f3c41
+Revises: a43d9e0c5f12
+Create Date: 2026-10-18 19:12:48.530172
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b27e8f3c41'
+down_revision = 'a43d9e0c5f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE MATERIALIZED VIEW "VenueListing" AS
+        SELECT id, name, city, state, upcoming_shows_count FROM "Venue"
+    """)
+    # REFRESH ... CONCURRENTLY needs a unique index
+    op.create_index('ix_VenueListing_id', 'VenueListing', ['id'], unique=True)
+    op.create_index('ix_VenueListing_state_city_id', 'VenueListing', ['state', 'city', 'id'])
+    # the latest change to Venue that the view reflects
+    op.execute('INSERT INTO "TableVersion" (table_name, changed_at) '
+               'SELECT \'VenueListing\', changed_at FROM "TableVersion" WHERE table_name = \'Venue\'')
+
+
+def downgrade():
+    op.execute('DELETE FROM "TableVersion" WHERE table_name = \'VenueListing\'')
+    op.execute('DROP MATERIALIZED VIEW "VenueListing"')
@@ -0,0 +1,69 @@
+"""add updated_at columns and table versions for conditional GETs
+
+Revision ID: e81f4a6b2d07
+Revises: c7b05e2f8a19
+Create Date: 2026-10-18 16:22:09.481337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81f4a6b2d07'
+down_revision = 'c7b05e2f8a19'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+
+def upgrade():
+    # now() is stable, so existing rows get one value without rewriting the table
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                       server_default=sa.text('now()'), nullable=False))
+
+    op.create_table('TableVersion',
+    sa.Column('table_name', sa.String(length=63), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute('INSERT INTO "TableVersion" (table_name, changed_at) VALUES '
+               + ', '.join(f"('{table}', now())" for table in TABLES))
+
+    # bulk UPDATEs (counters, imports) bypass the ORM's onupdate
+    op.execute("""
+        CREATE FUNCTION fyyur_touch_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+    """)
+    # one row per table: writers to the same table queue on it until they commit,
+    # which the write volume of Fyyur easily affords
+    op.execute("""
+        CREATE FUNCTION fyyur_bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE "TableVersion" SET changed_at = clock_timestamp() WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in TABLES:
+        op.execute(f'CREATE TRIGGER "{table}_touch_updated_at" BEFORE UPDATE ON "{table}" '
+                   f'FOR EACH ROW EXECUTE PROCEDURE fyyur_touch_updated_at()')
+        op.execute(f'CREATE TRIGGER "{table}_bump_table_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+                   f'ON "{table}" FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_bump_table_version()')
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.execute(f'DROP TRIGGER "{table}_bump_table_version" ON "{table}"')
+        op.execute(f'DROP TRIGGER "{table}_touch_updated_at" ON "{table}"')
+    op.execute('DROP FUNCTION fyyur_bump_table_version()')
+    op.execute('DROP FUNCTION fyyur_touch_updated_at()')
+    op.drop_table('TableVersion')
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
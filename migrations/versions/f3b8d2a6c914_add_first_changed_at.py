@@ -0,0 +1,43 @@
+"""record the first change a table's derived views miss, for the VenueListing staleness
+
+Revision ID: f3b8d2a6c914
+Revises: 8a2f6c4e1d93
+Create Date: 2026-10-19 10:14:36.208417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2a6c914'
+down_revision = '8a2f6c4e1d93'
+branch_labels = None
+depends_on = None
+
+BUMP = """
+    CREATE OR REPLACE FUNCTION fyyur_bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE "TableVersion" SET changed_at = clock_timestamp(){first_changed_at} WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def upgrade():
+    op.add_column('TableVersion', sa.Column('first_changed_at', sa.DateTime(timezone=True), nullable=True))
+    # set by the first change after the views built from the table caught up, cleared when they do again
+    op.execute(BUMP.format(first_changed_at=', first_changed_at = coalesce(first_changed_at, clock_timestamp())'))
+    # the view misses the changes since its version, which came after it at the earliest
+    op.execute("""
+        UPDATE "TableVersion" AS venue SET first_changed_at = listing.changed_at
+        FROM "TableVersion" AS listing
+        WHERE venue.table_name = 'Venue' AND listing.table_name = 'VenueListing'
+          AND venue.changed_at > listing.changed_at
+    """)
+
+
+def downgrade():
+    op.execute(BUMP.format(first_changed_at=''))
+    op.drop_column('TableVersion', 'first_changed_at')
@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_, DateTime
+
+
+class Page(object):
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_value(value, column):
+    if value is None:
+        raise ValueError(f'cursor value for {column.key} is missing')
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(f'cursor value for {column.key} is not a date')
+        return datetime.fromisoformat(value)
+    expected = column.type.python_type
+    # JSON true and false would pass for integers
+    if not isinstance(value, expected) or isinstance(value, bool):
+        raise ValueError(f'cursor value for {column.key} has the wrong type')
+    return value
+
+
+def decode_cursor(cursor, columns):
+    """The sort key values in ``cursor``; ValueError if it is not one :func:`encode_cursor` made for ``columns``."""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('cursor does not match the sort key')
+    return [_decode_value(value, column) for value, column in zip(values, columns)]
+
+
+def keyset_paginate(query, columns, key, after=None, before=None, per_page=50):
+    """Return one page of ``query`` ordered by ``columns``.
+
+    ``columns`` must form a unique sort key (end with the primary key) of
+    NOT NULL columns, since a NULL makes the row comparison NULL, and ``key``
+    maps a result row to the values of those columns. Only
+    ``per_page + 1`` rows are ever fetched, whatever the size of the table.
+    """
+    sort_key = tuple_(*columns)
+
+    if before:
+        query = query.filter(sort_key < tuple_(*decode_cursor(before, columns))) \
+            .order_by(*[column.desc() for column in columns])
+    else:
+        if after:
+            query = query.filter(sort_key > tuple_(*decode_cursor(after, columns)))
+        query = query.order_by(*columns)
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+
+    if not rows:
+        return Page(rows)
+
+    next_cursor = encode_cursor(key(rows[-1])) if has_more or before else None
+    prev_cursor = encode_cursor(key(rows[0])) if after or (before and has_more) else None
+    return Page(rows, next_cursor, prev_cursor)
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+_installed = False
+_timeouts_installed = False
+
+
+def _remember_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+def _check_pid(dbapi_connection, connection_record, connection_proxy):
+    pid = os.getpid()
+    if connection_record.info['pid'] != pid:
+        # the socket belongs to the process we were forked from; drop it without closing it
+        connection_record.connection = connection_proxy.connection = None
+        raise exc.DisconnectionError(
+            f'connection record belongs to pid {connection_record.info["pid"]}, '
+            f'attempting to check out in pid {pid}'
+        )
+
+
+def protect_pool_across_forks():
+    """Give every process its own database connections.
+
+    A preforking server (gunicorn with ``preload_app``) forks workers after
+    the app and its engine exist, so any connection the master opened would
+    be shared by all workers. A connection checked out in a process other
+    than the one that opened it is discarded and the pool connects again.
+    """
+    global _installed
+    if _installed:
+        return
+    event.listen(Pool, 'connect', _remember_pid)
+    event.listen(Pool, 'checkout', _check_pid)
+    _installed = True
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts take, including waiting for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'checked_out': self.checkedout(),
+                'idle': self.checkedin(),
+                'overflow': max(self.overflow(), 0),
+                'max_overflow': self._max_overflow,
+                'checkouts': self.checkouts,
+                'mean_wait_ms': round(self.wait_time / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'timeouts': self.timeouts,
+            }
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the DB_* settings of ``config``."""
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    # PgBouncer refuses startup options, so behind it the timeout is set per transaction instead
+    if config['DB_STATEMENT_TIMEOUT'] and not config['DB_PGBOUNCER']:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(config["DB_STATEMENT_TIMEOUT"])}'}
+    return options
+
+
+def _statement_timeout(config):
+    if not has_request_context():
+        return config['DB_COMMAND_STATEMENT_TIMEOUT']
+    return config['DB_ROUTE_STATEMENT_TIMEOUTS'].get(request.endpoint, config['DB_STATEMENT_TIMEOUT'])
+
+
+def _set_transaction_timeout(conn):
+    if not has_app_context():
+        return
+    config = current_app.config
+    timeout = _statement_timeout(config)
+    if timeout == config['DB_STATEMENT_TIMEOUT'] and not config['DB_PGBOUNCER']:
+        return
+    # straight on the DBAPI cursor, so it is neither counted against query budgets nor instrumented
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+    finally:
+        cursor.close()
+
+
+def apply_statement_timeouts():
+    """Apply DB_ROUTE_STATEMENT_TIMEOUTS and DB_COMMAND_STATEMENT_TIMEOUT to each transaction.
+
+    The connection itself carries DB_STATEMENT_TIMEOUT; a transaction that
+    needs a different limit gets a ``SET LOCAL``, which ends with the
+    transaction and so is also safe behind PgBouncer in transaction mode.
+    """
+    global _timeouts_installed
+    if _timeouts_installed:
+        return
+    event.listen(Engine, 'begin', _set_transaction_timeout)
+    _timeouts_installed = True
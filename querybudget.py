@@ -0,0 +1,165 @@
+import threading
+from functools import wraps
+
+from flask import current_app, g, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.strategies import LazyLoader
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+# requests that change nothing, so failing them loses no work
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+_local = threading.local()
+_installed = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _active_budgets():
+    if not hasattr(_local, 'budgets'):
+        _local.budgets = []
+    return _local.budgets
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for budget in _active_budgets():
+        budget.statements.append(statement)
+
+
+def _install():
+    """Hook every engine and the ORM lazy loader once per process."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _count_statement)
+
+    emit_lazyload = LazyLoader._emit_lazyload
+
+    @wraps(emit_lazyload)
+    def _emit_lazyload(self, *args, **kwargs):
+        for budget in _active_budgets():
+            budget.lazy_loads.append((self.parent.class_.__name__, self.key, budget.rendering > 0))
+        return emit_lazyload(self, *args, **kwargs)
+
+    LazyLoader._emit_lazyload = _emit_lazyload
+    _installed = True
+
+
+class QueryBudget(object):
+    """Count the statements run inside the block and fail if there are more than ``budget``.
+
+    Relationship lazy loads are recorded with their model and attribute, and
+    flagged when they were triggered while a template was rendering:
+
+        with QueryBudget(2, 'venue page'):
+            client.get('/venues/1')
+    """
+
+    def __init__(self, budget, label='block'):
+        _install()
+        self.budget = budget
+        self.label = label
+        self.statements = []
+        self.lazy_loads = []
+        self.rendering = 0
+
+    def __enter__(self):
+        _active_budgets().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_budgets().remove(self)
+        if exc_type is None:
+            self.check()
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        lines = [f'{self.label} ran {self.count} statement(s), budget is {self.budget}']
+        for model, attribute, in_template in self.lazy_loads:
+            where = ' inside a template' if in_template else ''
+            lines.append(f'  lazy load of {model}.{attribute}{where}')
+        lines.extend(f'  {" ".join(statement.split())[:200]}' for statement in self.statements)
+        return '\n'.join(lines)
+
+    def check(self):
+        if self.count > self.budget:
+            raise QueryBudgetExceeded(self.report())
+
+
+def max_queries(budget):
+    """Declare the most statements a view may run; place right under ``@app.route``."""
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+class QueryBudgetGuard(object):
+    """Enforce the budgets declared with ``max_queries`` on every request.
+
+    QUERY_BUDGET_MODE is 'raise' to fail the request, 'warn' to log the
+    report, or 'off'. The budget is checked once the view has returned, so
+    'raise' only fails GET, HEAD and OPTIONS requests: a write has already
+    been committed by then, and its overrun is logged instead.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_BUDGET_MODE', 'off')
+        app.before_request(self._start_request)
+        app.after_request(self._check_request)
+        # after_request is skipped when the view raises; the budget must stop counting regardless
+        app.teardown_request(self._end_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+
+    def _start_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is None or current_app.config['QUERY_BUDGET_MODE'] == 'off':
+            return
+        g._query_budget = QueryBudget(budget, f'{request.method} {request.path}').__enter__()
+
+    def _start_render(self, sender, **extra):
+        if g.get('_query_budget') is not None:
+            g._query_budget.rendering += 1
+
+    def _finish_render(self, sender, **extra):
+        if g.get('_query_budget') is not None:
+            g._query_budget.rendering -= 1
+
+    def _check_request(self, response):
+        budget = g.get('_query_budget')
+        if budget is None:
+            return response
+        if budget.count > budget.budget:
+            if current_app.config['QUERY_BUDGET_MODE'] == 'raise' and request.method in SAFE_METHODS:
+                budget.check()
+            current_app.logger.warning(budget.report())
+        return response
+
+    def _end_request(self, exception=None):
+        budget = g.pop('_query_budget', None)
+        if budget is not None and budget in _active_budgets():
+            _active_budgets().remove(budget)
+
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """The QueryBudget context manager, for ``pytest_plugins = ['querybudget']``."""
+        return QueryBudget
@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+@contextmanager
+def capture_selects(engine):
+    """Collect the (statement, parameters) of every SELECT run on ``engine``."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def sequential_scans(engine, statements):
+    """Return (relation, statement) for each sequential scan in the plans of ``statements``.
+
+    Sequential scans are disabled while planning, so one that still shows up
+    means no index can serve the query, however small the seeded tables are.
+    """
+    found = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('SET enable_seqscan = off')
+        for statement, parameters in statements:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            plan = cursor.fetchone()[0][0]['Plan']
+            found.extend((node['Relation Name'], statement)
+                         for node in _plan_nodes(plan) if node['Node Type'] == 'Seq Scan')
+        connection.rollback()
+    finally:
+        connection.close()
+    return found
+
+
+def explain_routes(app, engine, routes):
+    """Request each (method, url, data) route and return the sequential scans its queries plan."""
+    client = app.test_client()
+    found = []
+    for method, url, data in routes:
+        with capture_selects(engine) as statements:
+            client.open(url, method=method, data=data)
+        found.extend((method, url, relation, statement)
+                     for relation, statement in sequential_scans(engine, statements))
+    return found
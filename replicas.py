@@ -0,0 +1,190 @@
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# replay lag in seconds; 0 while the replica has replayed all the WAL it received, as
+# pg_last_xact_replay_timestamp() stays put while the primary is idle
+LAG_QUERY = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+class Replica(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+
+
+class ReplicaSet(object):
+    """The read replicas of one app, used round robin while they pass their health check.
+
+    A replica is checked at most every ``check_interval`` seconds, by the
+    request that finds its last check too old. It is skipped while it cannot
+    be reached or lags the primary by more than ``max_lag`` seconds, and as
+    soon as one of its connections fails.
+    """
+
+    def __init__(self, urls, engine_options, check_interval, max_lag):
+        self.replicas = [Replica(create_engine(url, **engine_options)) for url in urls]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._on_error(replica))
+
+    def _on_error(self, replica):
+        def mark_down(context):
+            # a lost connection, or one that could not be made
+            if context.is_disconnect or context.connection is None:
+                with self._lock:
+                    replica.healthy = False
+                    replica.error = str(context.original_exception).strip()
+                    replica.checked_at = time.monotonic()
+        return mark_down
+
+    def _check(self, replica):
+        try:
+            # straight on the DBAPI cursor, so it is neither counted against query budgets nor instrumented
+            connection = replica.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(LAG_QUERY)
+                lag = float(cursor.fetchone()[0])
+                cursor.close()
+            finally:
+                connection.close()
+        except Exception as error:
+            replica.healthy, replica.lag, replica.error = False, None, str(error).strip()
+        else:
+            replica.healthy, replica.lag = lag <= self.max_lag, lag
+            replica.error = None if replica.healthy else f'{lag:.1f}s behind the primary'
+        replica.checked_at = time.monotonic()
+
+    def _is_healthy(self, replica):
+        with self._lock:
+            due = replica.checked_at is None or time.monotonic() - replica.checked_at >= self.check_interval
+            if due:
+                # the others keep the previous verdict until this check is done
+                replica.checked_at = time.monotonic()
+        if due:
+            self._check(replica)
+        return replica.healthy
+
+    def choose(self):
+        """The engine of the next healthy replica, or None to read from the primary."""
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._is_healthy(replica):
+                return replica.engine
+        return None
+
+    def stats(self):
+        return [{
+            'url': repr(replica.engine.url),
+            'healthy': replica.healthy,
+            'lag_seconds': replica.lag,
+            'error': replica.error,
+            'pool': replica.engine.pool.status(),
+        } for replica in self.replicas]
+
+
+def read_only(view):
+    """Mark a view that never writes, so it reads from a replica even when posted to; place under ``@app.route``."""
+    view.read_only = True
+    return view
+
+
+def _reads_only():
+    if request.method in SAFE_METHODS:
+        return True
+    return getattr(current_app.view_functions.get(request.endpoint), 'read_only', False)
+
+
+def recently_wrote():
+    """Whether the client of the current request wrote in the last REPLICA_STICKY_SECONDS."""
+    return session.get('_primary_until', 0) > time.time()
+
+
+def read_from_replica():
+    """Whether the current request has read from a replica, which may lag the primary."""
+    return g.get('_read_engine') is not None
+
+
+def _read_engine():
+    """The replica engine the current request reads from, or None for the primary."""
+    replicas = current_app.extensions.get('replicas')
+    if not replicas or not has_request_context() or not _reads_only():
+        return None
+    if '_read_engine' not in g:
+        # a client that just wrote reads its writes back from the primary;
+        # one replica for the whole request, so its reads see one point in time
+        g._read_engine = None if recently_wrote() else replicas.choose()
+    return g._read_engine
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends the reads of read-only requests to a replica and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing:
+            engine = _read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+    def commit(self):
+        super().commit()
+        if has_request_context():
+            g._committed = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy with a :class:`RoutingSession` and the replicas of DATABASE_REPLICA_URLS.
+
+    The reads of GET, HEAD and OPTIONS requests and of the views marked
+    :func:`read_only` go to a replica. Writes, the requests of clients whose
+    last committed write is less than REPLICA_STICKY_SECONDS old, and
+    everything outside a request (commands, migrations) use the primary.
+    Without healthy replicas, so does everything.
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('DATABASE_REPLICA_URLS', [])
+        app.config.setdefault('REPLICA_CHECK_INTERVAL', 5)
+        app.config.setdefault('REPLICA_MAX_LAG', 5)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 15)
+        app.config.setdefault('REPLICA_CONNECT_TIMEOUT', 2)
+        if not app.config['DATABASE_REPLICA_URLS']:
+            return
+
+        options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        # an unreachable replica must not hold the request up for long
+        options['connect_args'] = dict(options.get('connect_args', {}),
+                                       connect_timeout=app.config['REPLICA_CONNECT_TIMEOUT'])
+        app.extensions['replicas'] = ReplicaSet(app.config['DATABASE_REPLICA_URLS'], options,
+                                                app.config['REPLICA_CHECK_INTERVAL'],
+                                                app.config['REPLICA_MAX_LAG'])
+        app.after_request(_remember_write)
+
+
+def _remember_write(response):
+    # a write that failed or was rolled back left nothing to read back
+    if g.pop('_committed', False):
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
@@ -0,0 +1,35 @@
+from sqlalchemy import func, or_, desc
+
+from facets import has_genre
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(session, model, term, limit=50, columns=None, genre=None):
+    """Return up to ``limit`` rows of ``model`` matching ``term``, best match first.
+
+    Rows hold ``columns``, (id, name) by default. On Postgres, candidates
+    come from the full-text and trigram GIN indexes over name, city and
+    genres and are ranked by text rank plus trigram similarity. Other
+    databases fall back to a case-insensitive substring match on name and
+    city ordered by name. With ``genre``, only rows of that genre match,
+    found through the GIN index on genres.
+    """
+    term = term.strip()
+    pattern = f'%{_escape_like(term.lower())}%'
+    query = session.query(*(columns or [model.id, model.name]))
+    if genre:
+        query = query.filter(has_genre(model, genre))
+
+    if session.get_bind().dialect.name != 'postgresql':
+        return query.filter(or_(model.name.ilike(pattern, escape='\\'),
+                                model.city.ilike(pattern, escape='\\'))) \
+            .order_by(model.name, model.id).limit(limit).all()
+
+    document = func.fyyur_search_text(model.name, model.city, model.genres)
+    ts_query = func.plainto_tsquery('simple', term)
+    rank = func.ts_rank(model.search_vector, ts_query) + func.similarity(document, term.lower())
+    return query.filter(or_(model.search_vector.op('@@')(ts_query), document.like(pattern, escape='\\'))) \
+        .order_by(desc(rank), model.id).limit(limit).all()
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from forms import VenueForm
+
+# (city, state) weighted roughly by the size of the local music scene
+AREAS = [
+    ('New York', 'NY', 100), ('Los Angeles', 'CA', 80), ('Nashville', 'TN', 60), ('Chicago', 'IL', 45),
+    ('Austin', 'TX', 40), ('San Francisco', 'CA', 35), ('Seattle', 'WA', 30), ('New Orleans', 'LA', 28),
+    ('Atlanta', 'GA', 22), ('Boston', 'MA', 20), ('Portland', 'OR', 18), ('Denver', 'CO', 15),
+    ('Philadelphia', 'PA', 14), ('Detroit', 'MI', 12), ('Minneapolis', 'MN', 10), ('Miami', 'FL', 10),
+    ('Memphis', 'TN', 9), ('Oakland', 'CA', 8), ('Brooklyn', 'NY', 8), ('Las Vegas', 'NV', 7),
+    ('Phoenix', 'AZ', 5), ('Kansas City', 'MO', 5), ('Salt Lake City', 'UT', 3), ('Burlington', 'VT', 2),
+]
+# hours a show books its venue for, cut off at midnight, as Show.during has it
+BOOKING_HOURS = 4
+# random picks of a venue and time for one show before the venues count as fully booked
+MAX_BOOKING_ATTEMPTS = 1000
+# the form's genre choices, most popular first
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+GENRE_POPULARITY = ['Rock n Roll', 'Pop', 'Hip-Hop', 'Alternative', 'Jazz', 'Electronic', 'R&B', 'Country',
+                    'Folk', 'Blues', 'Punk', 'Soul', 'Heavy Metal', 'Funk', 'Reggae', 'Classical',
+                    'Instrumental', 'Musical Theatre', 'Other']
+VENUE_WORDS = ['Blue', 'Note', 'Velvet', 'Room', 'Hall', 'Lounge', 'Cellar', 'Garden', 'Station', 'Palace',
+               'Dive', 'Social', 'Basement', 'Loft', 'Electric', 'Ballroom', 'Tavern', 'Echo', 'Union', 'Pier']
+ARTIST_WORDS = ['Guns', 'Roses', 'Wild', 'Sax', 'Band', 'Quartet', 'Matt', 'Quevedo', 'Night', 'Owls',
+                'Brothers', 'Sisters', 'Static', 'Lights', 'Tide', 'Orchestra', 'Collective', 'Kids', 'Moon', 'Fox']
+
+
+def _zipf_cum_weights(n, exponent=1.0):
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+_AREA_CUM_WEIGHTS = list(accumulate(weight for _, _, weight in AREAS))
+_GENRE_CUM_WEIGHTS = _zipf_cum_weights(len(GENRE_POPULARITY))
+assert sorted(GENRE_POPULARITY) == sorted(GENRES)
+
+
+def _area(rng):
+    city, state, _ = rng.choices(AREAS, cum_weights=_AREA_CUM_WEIGHTS)[0]
+    return city, state
+
+
+def _genres(rng):
+    return sorted(set(rng.choices(GENRE_POPULARITY, cum_weights=_GENRE_CUM_WEIGHTS, k=rng.randint(1, 3))))
+
+
+def _name(rng, words, number):
+    return f'{" ".join(rng.sample(words, rng.randint(1, 3)))} {number}'
+
+
+def generate_venues(rng, count):
+    for number in range(1, count + 1):
+        city, state = _area(rng)
+        yield {
+            'name': _name(rng, VENUE_WORDS, number),
+            'genres': _genres(rng),
+            'city': city,
+            'state': state,
+            'address': f'{rng.randint(1, 9999)} {rng.choice(VENUE_WORDS)} St',
+            'phone': ''.join(rng.choices('0123456789', k=10)),
+            'website': f'https://venue{number}.example.com',
+            'image_link': f'https://images.example.com/venues/{number}.jpg',
+            'facebook_link': f'https://www.facebook.com/venue{number}',
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': 'We are on the lookout for a local artist to play every two weeks.',
+        }
+
+
+def generate_artists(rng, count):
+    for number in range(1, count + 1):
+        city, state = _area(rng)
+        yield {
+            'name': _name(rng, ARTIST_WORDS, number),
+            'genres': _genres(rng),
+            'city': city,
+            'state': state,
+            'phone': ''.join(rng.choices('0123456789', k=10)),
+            'website': f'https://artist{number}.example.com',
+            'image_link': f'https://images.example.com/artists/{number}.jpg',
+            'facebook_link': f'https://www.facebook.com/artist{number}',
+            'seeking_venue': rng.random() < 0.4,
+            'seeking_description': 'Looking for shows to perform at in the area!',
+        }
+
+
+def generate_shows(rng, count, venue_count, artist_count, now=None):
+    """Yield shows over the last two years and the next six months.
+
+    Venue and artist ids are 1..venue_count and 1..artist_count; a few
+    popular venues and artists get most of the shows. No venue is double booked:
+    ValueError when no free slot turns up for a show, as the venues are too few
+    for ``count`` shows.
+    """
+    now = now or datetime.now()
+    venue_weights = _zipf_cum_weights(venue_count, 0.8)
+    artist_weights = _zipf_cum_weights(artist_count, 0.8)
+    # (venue id, day) -> start hours, to keep a venue from being double booked
+    booked = {}
+    for number in range(count):
+        for _ in range(MAX_BOOKING_ATTEMPTS):
+            venue_id = rng.choices(range(1, venue_count + 1), cum_weights=venue_weights)[0]
+            start_time = (now + timedelta(days=rng.uniform(-730, 180))).replace(minute=0, second=0, microsecond=0)
+            hours = booked.setdefault((venue_id, start_time.date()), [])
+            if all(abs(hour - start_time.hour) >= BOOKING_HOURS for hour in hours):
+                break
+        else:
+            raise ValueError(f'{venue_count} venue(s) are fully booked after {number} shows')
+        hours.append(start_time.hour)
+        yield {
+            'venue_id': venue_id,
+            'artist_id': rng.choices(range(1, artist_count + 1), cum_weights=artist_weights)[0],
+            'start_time': start_time,
+        }
@@ -0,0 +1,29 @@
+"""Fixtures for tests that run against the Postgres database in TEST_DATABASE_URL.
+
+The database has to be migrated (``FYYUR_ENV=testing flask db upgrade``);
+its data is replaced by the seeded data sets.
+"""
+import pytest
+
+from app import create_app, db, seed_database
+
+
+@pytest.fixture(scope='session')
+def app():
+    # no app context is kept pushed: requests would share its g
+    return create_app('testing')
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """seed(venues): replace the data with ``venues`` venues, twice as many artists and 20 shows a venue."""
+    def seed(venues):
+        with app.app_context():
+            seed_database(venues, venues * 2, venues * 20, seed=1)
+            db.session.remove()
+    return seed
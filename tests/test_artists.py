@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import func
+
+from app import db, Artist
+
+
+@pytest.mark.parametrize('size', [10, 200])
+def test_artist_page_loads_its_shows_in_one_query(app, client, seed, query_budget, size):
+    seed(size)
+    with app.app_context():
+        artist_id = db.session.query(func.min(Artist.id)).scalar()
+    with query_budget(3, f'GET /artists/{artist_id}') as budget:
+        response = client.get(f'/artists/{artist_id}')
+    assert response.status_code == 200
+    assert budget.count == 3
+    assert budget.lazy_loads == []
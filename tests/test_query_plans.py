@@ -0,0 +1,14 @@
+from sqlalchemy import func
+
+from app import db, read_routes, Venue, Artist
+from queryplan import explain_routes
+
+
+def test_read_routes_are_served_by_indexes(app, seed):
+    seed(50)
+    with app.app_context():
+        venue_id = db.session.query(func.min(Venue.id)).scalar()
+        artist_id = db.session.query(func.min(Artist.id)).scalar()
+        db.session.remove()
+        found = explain_routes(app, db.engine, read_routes(venue_id, artist_id))
+    assert [f'{method} {url}: sequential scan on "{relation}"' for method, url, relation, _ in found] == []
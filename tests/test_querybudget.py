@@ -0,0 +1,54 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+from querybudget import QueryBudgetExceeded, QueryBudgetGuard, max_queries, _active_budgets
+
+
+@pytest.fixture
+def guarded_app():
+    app = Flask(__name__)
+    app.testing = True
+    app.config['QUERY_BUDGET_MODE'] = 'raise'
+    QueryBudgetGuard(app)
+    engine = create_engine('sqlite://')
+
+    @app.route('/', methods=['GET', 'POST'])
+    @max_queries(1)
+    def two_statements():
+        with engine.connect() as connection:
+            connection.execute('SELECT 1')
+            connection.execute('SELECT 2')
+        return 'done'
+
+    @app.route('/fails')
+    @max_queries(1)
+    def fails():
+        raise RuntimeError('view failed')
+
+    return app
+
+
+def test_budget_overrun_fails_a_read(guarded_app):
+    with pytest.raises(QueryBudgetExceeded):
+        guarded_app.test_client().get('/')
+
+
+def test_budget_overrun_of_a_write_is_only_logged(guarded_app, caplog):
+    response = guarded_app.test_client().post('/')
+    assert response.status_code == 200
+    assert 'POST / ran 2 statement(s), budget is 1' in caplog.text
+
+
+def test_query_budget_counts_statements(query_budget):
+    engine = create_engine('sqlite://')
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1, 'two selects'):
+            engine.execute('SELECT 1')
+            engine.execute('SELECT 2')
+
+
+def test_a_failed_request_stops_counting(guarded_app):
+    with pytest.raises(RuntimeError):
+        guarded_app.test_client().get('/fails')
+    assert _active_budgets() == []
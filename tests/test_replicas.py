@@ -0,0 +1,94 @@
+"""Read-replica routing, against two local Postgres instances.
+
+TEST_REPLICA_DATABASE_URL names a migrated database on the second instance.
+It stands in for a replica: it is seeded with fewer venues than the primary,
+so every page tells which of the two it was read from.
+"""
+import os
+import re
+
+import pytest
+
+import config
+from app import create_app, db, seed_database
+
+REPLICA_URL = os.environ.get('TEST_REPLICA_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not REPLICA_URL, reason='TEST_REPLICA_DATABASE_URL is not set')
+
+PRIMARY_VENUES = 10
+REPLICA_VENUES = 4
+
+VENUE_FORM = {
+    'name': 'Replica Test Venue', 'genres': ['Jazz'], 'city': 'New York', 'state': 'NY', 'address': '1 Test St',
+    'phone': '5550000000', 'website': 'https://venue.example.com', 'image_link': '',
+    'facebook_link': 'https://www.facebook.com/venue', 'seeking_description': '',
+}
+
+
+@pytest.fixture
+def seeded(seed):
+    seed(PRIMARY_VENUES)
+    replica = create_app('testing')
+    replica.config['SQLALCHEMY_DATABASE_URI'] = REPLICA_URL
+    with replica.app_context():
+        seed_database(REPLICA_VENUES, REPLICA_VENUES * 2, REPLICA_VENUES * 20, seed=2)
+        db.session.remove()
+
+
+@pytest.fixture
+def routed(monkeypatch, seeded):
+    """routed(*urls): a test client of an app with the replicas ``urls``, by default the test replica."""
+    def routed(*urls):
+        monkeypatch.setattr(config.TestingConfig, 'DATABASE_REPLICA_URLS', list(urls or [REPLICA_URL]))
+        app = create_app('testing')
+        return app, app.test_client()
+    return routed
+
+
+def listed_venues(client):
+    page = client.get('/venues?per_page=100').get_data(as_text=True)
+    return len(set(re.findall(r'href="/venues/(\d+)"', page)))
+
+
+def found_venues(client):
+    page = client.post('/venues/search', data={'search_term': ''}).get_data(as_text=True)
+    return len(set(re.findall(r'href="/venues/(\d+)"', page)))
+
+
+def test_reads_go_to_the_replica(routed):
+    _, client = routed()
+    assert listed_venues(client) == REPLICA_VENUES
+
+
+def test_searches_go_to_the_replica_and_do_not_pin_the_client(routed):
+    _, client = routed()
+    assert found_venues(client) == REPLICA_VENUES
+    assert listed_venues(client) == REPLICA_VENUES
+
+
+def test_a_client_reads_its_writes_from_the_primary(routed):
+    _, client = routed()
+    client.post('/venues/create', data=VENUE_FORM)
+    assert listed_venues(client) == PRIMARY_VENUES + 1
+    # other clients keep reading from the replica
+    assert listed_venues(routed()[1]) == REPLICA_VENUES
+
+
+def test_a_failed_write_does_not_pin_the_client(routed):
+    _, client = routed()
+    # no such venue: the insert fails its foreign key and is rolled back
+    client.post('/shows/create', data={'venue_id': '999999', 'artist_id': '1', 'start_time': '2030-01-01 20:00:00'})
+    assert listed_venues(client) == REPLICA_VENUES
+
+
+def test_pages_read_from_the_replica_are_not_cached(routed):
+    app, client = routed()
+    assert client.get('/venues/1').status_code == 200
+    assert app.extensions['page_cache'].stats()['size'] == 0
+
+
+def test_reads_fall_back_to_the_primary_without_a_healthy_replica(routed):
+    app, client = routed('postgresql://postgres@/fyyur?host=/nonexistent')
+    assert listed_venues(client) == PRIMARY_VENUES
+    assert not app.extensions['replicas'].stats()[0]['healthy']
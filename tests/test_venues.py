@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import func
+
+from app import create_app, db, Venue
+
+
+@pytest.mark.parametrize('size', [10, 200])
+def test_venues_query_count_does_not_grow_with_the_data(client, seed, query_budget, size):
+    seed(size)
+    with query_budget(2, 'GET /venues') as budget:
+        response = client.get('/venues')
+    assert response.status_code == 200
+    assert budget.count == 2
+
+
+@pytest.mark.parametrize('size', [10, 200])
+def test_venue_page_loads_its_shows_in_one_query(app, client, seed, query_budget, size):
+    seed(size)
+    with app.app_context():
+        venue_id = db.session.query(func.min(Venue.id)).scalar()
+    with query_budget(3, f'GET /venues/{venue_id}') as budget:
+        response = client.get(f'/venues/{venue_id}')
+    assert response.status_code == 200
+    assert budget.count == 3
+    assert budget.lazy_loads == []
+
+
+def test_an_edit_through_another_worker_is_not_served_from_the_cache(app, client, seed, query_budget):
+    seed(10)
+    with app.app_context():
+        venue = db.session.query(Venue).order_by(Venue.id).first()
+        form = {'name': 'Renamed Venue', 'genres': venue.genres, 'city': venue.city, 'state': venue.state,
+                'address': venue.address or '', 'phone': venue.phone or '', 'website': venue.website or '',
+                'image_link': venue.image_link or '', 'facebook_link': venue.facebook_link or '',
+                'seeking_description': venue.seeking_description or ''}
+        venue_id = venue.id
+        db.session.remove()
+    assert 'Renamed Venue' not in client.get(f'/venues/{venue_id}').get_data(as_text=True)
+    with query_budget(1, 'cache hit'):
+        assert client.get(f'/venues/{venue_id}').status_code == 200
+
+    # a worker of its own, with a page cache of its own
+    create_app('testing').test_client().post(f'/venues/{venue_id}/edit', data=form)
+    assert 'Renamed Venue' in client.get(f'/venues/{venue_id}').get_data(as_text=True)